@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+    Microbenchmark of the conversion of Robot Framework timestamps to XRAY dates.
+
+    Compares datetime.strptime/strftime, used before, with rfw2xray_dates.TimestampConverter, on timestamps that
+    share their second as tests of a run do, and on timestamps that are all different.
+
+        python benchmarks/bench_dates.py [number of timestamps]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import constants
+import rfw2xray_dates
+
+
+def strptime_convert(timestamp):
+    return datetime.strptime(timestamp, constants.DATE_ROBOT_FRAMEWORK_FORMAT).strftime('%Y-%m-%dT%H:%M:%S+01:00')
+
+
+def robot_timestamps(count, step):
+    start = datetime(2018, 8, 30, 11, 47, 35)
+    return [(start + timedelta(milliseconds=i * step)).strftime(constants.DATE_ROBOT_FRAMEWORK_FORMAT)[:-3]
+            for i in range(count)]
+
+
+def bench(name, timestamps, repeat=3):
+    converter = [None]
+
+    def converted():
+        convert = converter[0].convert
+        for timestamp in timestamps:
+            convert(timestamp)
+
+    def reference():
+        for timestamp in timestamps:
+            strptime_convert(timestamp)
+
+    def setup():
+        converter[0] = rfw2xray_dates.TimestampConverter()
+
+    reference_time = min(timeit.repeat(reference, number=1, repeat=repeat))
+    converted_time = min(timeit.repeat(converted, setup=setup, number=1, repeat=repeat))
+    print '{:<28} strptime: {:8.3f}s  converter: {:8.3f}s  speedup: {:6.1f}x'.format(
+        name, reference_time, converted_time, reference_time / converted_time)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    # the converter gives the same dates
+    for timestamp in robot_timestamps(1000, 997):
+        assert strptime_convert(timestamp) == rfw2xray_dates.TimestampConverter().convert(timestamp)
+
+    # tests of a run, a few milliseconds apart
+    bench('shared seconds (5 ms apart)', robot_timestamps(count, 5))
+    # every timestamp in a different second
+    bench('distinct seconds', robot_timestamps(count, 1500))
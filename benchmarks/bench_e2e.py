@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+    End-to-end throughput benchmark of rfw2xray_results.py, parse and upload, against the local Xray stub.
+
+    For each payload shape, generates an output file and imports it with the command line, in a new process, to
+    a stub started by the benchmark. Reports the tests imported per second, the request bytes sent per second and
+    the peak RSS of the import. Exits with 1 if an import fails or the stub did not receive every test.
+
+    With a fault rate, the stub answers that fraction of the requests with a 503 and a Retry-After header, a 502 or
+    a 504, which the import must retry, within a retry budget of one retry per test. The tests of the output files
+    then have test execution keys: the creation of a test execution issue is not retried on a 502 or a 504, it may
+    have been processed.
+
+        python benchmarks/bench_e2e.py [number of tests] [latency of the stub] [fault rate]
+                                       [-- options of rfw2xray_results.py]
+
+    Example, with compressed requests split in payloads of 1 MB:
+
+        python benchmarks/bench_e2e.py 2000 0.02 -- --compress -mpb 1048576
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import output_generator
+import xray_stub
+
+RESULTS_SCRIPT = os.path.join(BENCHMARKS_DIR, os.pardir, 'rfw2xray_results.py')
+
+# name, steps of each test, options of the import
+SHAPES = (
+    ('headers', 0, ['-ns', '-es', 'None']),
+    ('fail', 8, ['-es', 'Fail']),
+    ('all', 8, ['-es', 'All']),
+)
+
+
+def run_import(xml_file, url, options):
+    """
+    Import an output file with the command line
+
+    :return: Exit code, wall time in seconds and peak RSS in KB of the import process
+    """
+    command = [sys.executable, RESULTS_SCRIPT, xml_file, url, 'bench', '-pw', 'bench', '-pk', 'BENCH-1'] + options
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        process = subprocess.Popen(command, stdout=devnull, cwd=os.path.dirname(xml_file))
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.time() - start
+    return os.WEXITSTATUS(status), elapsed, usage.ru_maxrss
+
+
+if __name__ == '__main__':
+    extra_options = []
+    args = sys.argv[1:]
+    if '--' in args:
+        extra_options = args[args.index('--') + 1:]
+        args = args[:args.index('--')]
+    tests = int(args[0]) if args else 2000
+    latency = float(args[1]) if len(args) > 1 else 0.0
+    fault_rate = float(args[2]) if len(args) > 2 else 0.0
+    if fault_rate:
+        extra_options = ['--retry-budget', str(tests)] + extra_options
+
+    work_dir = tempfile.mkdtemp()
+    succeeded = True
+    try:
+        for name, steps, options in SHAPES:
+            xml_file = os.path.join(work_dir, 'output-{}.xml'.format(name))
+            output_generator.write_output(xml_file, tests, steps=steps, fail_ratio=0.2,
+                                          test_execs=2 if fault_rate else 0, seed=1)
+
+            stub = xray_stub.XrayStub(latency=latency, retry_after=0, seed=1, unavailable_rate=fault_rate / 2,
+                                      gateway_error_rate=fault_rate / 2).start()
+            try:
+                code, elapsed, peak_rss = run_import(xml_file, stub.url, options + extra_options)
+            finally:
+                stub.shutdown()
+                stub.server_close()
+
+            stats = stub.stats
+            ok = code == 0 and stats.tests == tests
+            succeeded = succeeded and ok
+            print '{:<10} {:>6} tests {:>7.1f} MB file  {:>7.2f}s  {:>8.1f} tests/s  {:>7.2f} MB/s sent  ' \
+                  '{:>4} requests ({} faults)  peak RSS {:>7.1f} MB  {}'.format(
+                      name, tests, os.path.getsize(xml_file) / 1048576.0, elapsed, tests / elapsed,
+                      stats.body_bytes / 1048576.0 / elapsed, stats.requests,
+                      stats.unavailable + stats.gateway_errors, peak_rss / 1024.0,
+                      'ok' if ok else 'FAILED (exit {}, {} tests received)'.format(code, stats.tests))
+            os.remove(xml_file)
+    finally:
+        shutil.rmtree(work_dir)
+
+    sys.exit(0 if succeeded else 1)
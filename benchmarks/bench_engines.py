@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+    Benchmark of the parser engines of the import.
+
+    Generates an output file whose tests have steps with nested keywords, WARN logs, screenshots and failures, and
+    imports it with the tree and the target engines, for each combination of test steps and evidences selection.
+    Both engines must produce the same payloads, the benchmark exits with 1 otherwise.
+
+        python benchmarks/bench_engines.py [number of tests] [repeat]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, os.pardir))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import constants
+import output_generator
+import rfw2xray_results
+import testexec_builder
+
+# one test out of five fails
+OUTPUT_SHAPE = dict(steps=8, fail_ratio=0.2, seed=1)
+
+
+def payloads(test_execs):
+    return dict((key, ''.join(testexec_builder.iter_json(test_exec))) for key, test_exec in test_execs.items())
+
+
+if __name__ == '__main__':
+    tests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    work_dir = tempfile.mkdtemp()
+    identical = True
+    try:
+        path = os.path.join(work_dir, 'output.xml')
+        output_generator.write_output(path, tests, **OUTPUT_SHAPE)
+        print '{} tests, {:.1f} MB file'.format(tests, os.path.getsize(path) / 1048576.0)
+
+        for test_steps in (True, False):
+            for evidences in (constants.EVIDENCES_SELECTION_ALL, constants.EVIDENCES_SELECTION_FAIL,
+                              constants.EVIDENCES_SELECTION_NONE):
+                times = {}
+                results = {}
+                for engine in constants.PARSER_ENGINE_CHOICES:
+                    def run():
+                        results[engine] = rfw2xray_results.no_filtering_import(path, test_steps, evidences, False,
+                                                                               engine, summary='Engines')
+                    times[engine] = min(timeit.repeat(run, number=1, repeat=repeat))
+
+                same = payloads(results[constants.PARSER_ENGINE_TREE]) == \
+                    payloads(results[constants.PARSER_ENGINE_TARGET])
+                identical = identical and same
+                print 'steps: {!s:<5} evidences: {:<4}  tree: {:7.3f}s  target: {:7.3f}s  {}'.format(
+                    test_steps, evidences, times[constants.PARSER_ENGINE_TREE],
+                    times[constants.PARSER_ENGINE_TARGET], 'same payloads' if same else 'DIFFERENT PAYLOADS')
+    finally:
+        shutil.rmtree(work_dir)
+
+    sys.exit(0 if identical else 1)
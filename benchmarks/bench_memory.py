@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+    Memory regression check of the streaming parse of Robot Framework output files.
+
+    Generates output files of increasing size, whose tests have deep keyword trees, and measures the peak RSS of
+    no_filtering_import on each of them, with test steps and all evidences imported, in a new process and for each
+    parser engine. Keywords are then parsed, and the parse keeps only the open suites and the test being parsed, so
+    the peak RSS must not grow with the file size beyond the test records it returns. Exits with 1 if, for an engine,
+    the peak RSS of the biggest file exceeds the one of the smallest by more than the allowed growth.
+
+        python benchmarks/bench_memory.py [tests of the smallest file] [number of files] [allowed growth in MB]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARKS_DIR, os.pardir)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import constants
+import output_generator
+
+# tests of about 75 KB, with deep keyword trees
+OUTPUT_SHAPE = dict(suite_depth=0, steps=3, keyword_depth=4, keyword_width=3, fail_ratio=0.0, test_execs=0, seed=1)
+
+PARSE_SCRIPT = """
+import resource, sys
+sys.path.insert(0, sys.argv[1])
+import constants, rfw2xray_results
+test_execs = rfw2xray_results.no_filtering_import(sys.argv[2], True, constants.EVIDENCES_SELECTION_ALL, False,
+                                                  sys.argv[3])
+print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+"""
+
+
+def peak_rss_kb(path, engine):
+    output = subprocess.check_output([sys.executable, '-c', PARSE_SCRIPT, ROOT_DIR, path, engine])
+    return int(output.split()[-1])
+
+
+if __name__ == '__main__':
+    tests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    allowed_growth_mb = float(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        peaks = dict((engine, []) for engine in constants.PARSER_ENGINE_CHOICES)
+        for index in range(files):
+            file_tests = tests * 2 ** index
+            path = os.path.join(work_dir, 'output-{}.xml'.format(file_tests))
+            output_generator.write_output(path, file_tests, **OUTPUT_SHAPE)
+            for engine in constants.PARSER_ENGINE_CHOICES:
+                peaks[engine].append(peak_rss_kb(path, engine))
+                print '{:>8} tests {:>8.1f} MB file  {:<6} peak RSS {:>8.1f} MB'.format(
+                    file_tests, os.path.getsize(path) / 1048576.0, engine, peaks[engine][-1] / 1024.0)
+            os.remove(path)
+    finally:
+        shutil.rmtree(work_dir)
+
+    failed = False
+    for engine in constants.PARSER_ENGINE_CHOICES:
+        growth_mb = (peaks[engine][-1] - peaks[engine][0]) / 1024.0
+        print '{:<6} peak RSS growth: {:.1f} MB (allowed {:.1f} MB)'.format(engine, growth_mb, allowed_growth_mb)
+        failed = failed or growth_mb > allowed_growth_mb
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+    Benchmark of the phases of the import, parse and build, on synthetic output files of increasing size.
+
+    For each number of tests, generates an output file with benchmarks/output_generator.py and times:
+        - parse: streaming the tests of the file with the parser engine, keywords included
+        - _parse_test_steps: the creation of the steps and evidences of the tests, out of the parse
+        - no_filtering_import: the whole import of the file
+        - filtering_import: the import of the tests tagged "smoke", one test out of ten
+        - estimate_json_size, split_test_exec, iter_json: the testexec_builder helpers on the imported test
+          executions, split in payloads of 1 MB and serialized with their evidences
+
+    Each phase is timed repeat times and its best time is compared to the baseline stored for the same number of
+    tests. Baselines depend on the machine, so they are kept in a local file, not committed: the first run of a
+    number of tests records its baselines, and --save records them again, e.g. before comparing changes. Exits
+    with 1 if a phase is slower than its baseline by more than the threshold.
+
+        python benchmarks/bench_phases.py [--sizes 1000 10000 100000] [--repeat 3] [--threshold 0.25] [--save]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, os.pardir))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import constants
+import output_generator
+import rfw2xray_parser
+import rfw2xray_results
+import testexec_builder
+from testexec_model import TestCase
+
+# local baselines of the machine, ignored by git
+BASELINE_FILE = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+# shape of the generated output files
+OUTPUT_SHAPE = dict(suite_depth=2, suite_width=3, steps=3, keyword_depth=2, keyword_width=2, fail_ratio=0.1,
+                    test_execs=4, seed=1)
+PAYLOAD_BYTES = 1024 * 1024
+
+
+def _parse(xml_file, engine):
+    for tag, result in rfw2xray_parser.iter_results(xml_file, engine):
+        if tag == constants.TEST_TAG:
+            result.name, result.tags
+
+
+def _parse_test_steps(xml_file, engine):
+    """
+    :return: Time spent in _parse_test_steps
+    """
+    elapsed = 0.0
+    for tag, result in rfw2xray_parser.iter_results(xml_file, engine):
+        if tag == constants.TEST_TAG:
+            test = TestCase(result.name, constants.FAIL)
+            start = time.time()
+            rfw2xray_results._parse_test_steps(xml_file, result, test, True, constants.EVIDENCES_SELECTION_ALL)
+            elapsed += time.time() - start
+    return elapsed
+
+
+def _estimate_json_size(test_execs):
+    for test_exec in test_execs.values():
+        testexec_builder.estimate_json_size(test_exec)
+
+
+def _split_test_exec(test_execs):
+    for test_exec in test_execs.values():
+        for _ in testexec_builder.split_test_exec(test_exec, PAYLOAD_BYTES):
+            pass
+
+
+def _iter_json(test_execs):
+    for test_exec in test_execs.values():
+        for _ in testexec_builder.iter_json(test_exec):
+            pass
+
+
+def best_time(function, repeat):
+    """
+    :param function: Function timed, it may return the time to keep, as a float, instead of its whole time
+    :return: Best time of the repeats, in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        measured = function()
+        times.append(measured if isinstance(measured, float) else time.time() - start)
+    return min(times)
+
+
+def time_phases(xml_file, repeat, engine):
+    """
+    :return: List of (phase, best time)
+    """
+    def no_filtering_import():
+        return rfw2xray_results.no_filtering_import(xml_file, True, constants.EVIDENCES_SELECTION_ALL, False, engine,
+                                                    summary='Phases')
+
+    phases = [
+        ('parse', best_time(lambda: _parse(xml_file, engine), repeat)),
+        ('_parse_test_steps', best_time(lambda: _parse_test_steps(xml_file, engine), repeat)),
+        ('no_filtering_import', best_time(no_filtering_import, repeat)),
+        ('filtering_import', best_time(lambda: rfw2xray_results.filtering_import(
+            xml_file, True, constants.EVIDENCES_SELECTION_ALL, {constants.FILTER_TAG_KEY: ['smoke']},
+            constants.FILTER_OPTION_AND, False, engine, summary='Phases'), repeat)),
+    ]
+    test_execs = no_filtering_import()
+    phases += [
+        ('estimate_json_size', best_time(lambda: _estimate_json_size(test_execs), repeat)),
+        ('split_test_exec', best_time(lambda: _split_test_exec(test_execs), repeat)),
+        ('iter_json', best_time(lambda: _iter_json(test_execs), repeat)),
+    ]
+    return phases
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the phases of the import')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of tests')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown over the baseline, 0.25 for 25%%')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline file')
+    parser.add_argument('--save', action='store_true',
+                        help='Store the times as the baselines of their sizes, the baselines missing are always stored')
+    parser.add_argument('--engine', choices=constants.PARSER_ENGINE_CHOICES, default=constants.PARSER_ENGINE_DEFAULT)
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+
+    regressions = []
+    saved = False
+    work_dir = tempfile.mkdtemp()
+    try:
+        for tests in args.sizes:
+            xml_file = os.path.join(work_dir, 'output.xml')
+            output_generator.write_output(xml_file, tests, **OUTPUT_SHAPE)
+            print '{} tests, {:.1f} MB file'.format(tests, os.path.getsize(xml_file) / 1048576.0)
+
+            size_baselines = baselines.setdefault(str(tests), {})
+            for phase, elapsed in time_phases(xml_file, args.repeat, args.engine):
+                baseline = size_baselines.get(phase)
+                comparison = 'new baseline'
+                if baseline:
+                    ratio = elapsed / baseline
+                    regressed = ratio > 1 + args.threshold
+                    comparison = '{:>6.2f}x baseline {:.3f}s{}'.format(ratio, baseline,
+                                                                      '  REGRESSION' if regressed else '')
+                    if regressed:
+                        regressions.append((tests, phase))
+                print '  {:<20} {:>8.3f}s  {}'.format(phase, elapsed, comparison)
+                if args.save or not baseline:
+                    size_baselines[phase] = round(elapsed, 4)
+                    saved = True
+            os.remove(xml_file)
+    finally:
+        shutil.rmtree(work_dir)
+
+    if saved:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, separators=(',', ': '), sort_keys=True)
+            baseline_file.write('\n')
+
+    sys.exit(1 if regressions and not args.save else 0)
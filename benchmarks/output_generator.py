@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+    Generator of synthetic Robot Framework output files, to benchmark the import.
+
+    The tests are spread over a tree of nested suites and tagged with JIRA_TEST and JIRA_TESTEXEC keys. Each test
+    has steps with keyword trees of a given depth, whose leaves click elements, log WARN messages with the BuiltIn
+    Log keyword or capture page screenshots. A failed test fails in one of its steps: the failure goes up from a
+    leaf keyword through its parents, and the following steps are not run. Every test has a teardown, that captures
+    a screenshot when the test failed. Screenshot files are written next to the output file and shared by the tests.
+
+        python benchmarks/output_generator.py output.xml [--tests 10000] [--suite-depth 2] [--keyword-depth 3]
+                                                         [--fail-ratio 0.1] [--seed 1]
+"""
+import argparse
+import os
+import random
+
+TIMESTAMP = '20180830 11:47:35.123'
+SCREENSHOT_FILE = 'selenium-screenshot-{}.png'
+
+
+def _status(status, critical=False, text=''):
+    return '<status status="{0}" starttime="{1}" endtime="{1}"{2}>{3}</status>'.format(
+        status, TIMESTAMP, ' critical="yes"' if critical else '', text)
+
+
+def _msg(level, text):
+    return '<msg timestamp="{}" level="{}">{}</msg>'.format(TIMESTAMP, level, text)
+
+
+def _arguments(args):
+    return '<arguments>{}</arguments>'.format(''.join('<arg>{}</arg>'.format(arg) for arg in args))
+
+
+def _keyword(name, children='', status='PASS', args=(), library='SeleniumLibrary', type=None):
+    return '<kw name="{}" library="{}"{}>{}{}{}</kw>'.format(
+        name, library, ' type="{}"'.format(type) if type else '', _arguments(args) if args else '', children,
+        _status(status))
+
+
+def _screenshot(index):
+    link = SCREENSHOT_FILE.format(index)
+    return _keyword('Capture Page Screenshot', _msg('INFO', '&lt;/td&gt;&lt;/tr&gt;&lt;tr&gt;&lt;td colspan="3"&gt;'
+                                                            '&lt;a href="{0}"&gt;&lt;img src="{0}" width="800px"&gt;'
+                                                            '&lt;/a&gt;'.format(link)))
+
+
+class OutputGenerator(object):
+    """
+    Writes the suites, tests and keywords of a synthetic output file
+    """
+
+    def __init__(self, tests=1000, suite_depth=2, suite_width=3, steps=5, keyword_depth=2, keyword_width=2,
+                 fail_ratio=0.1, warn_ratio=0.2, screenshot_ratio=0.1, test_execs=2, project='GEN', screenshots=20,
+                 screenshot_bytes=16384, seed=None):
+        """
+        :param tests: Number of tests
+        :param suite_depth: Depth of the suites under the top suite, the tests are in the deepest suites
+        :param suite_width: Child suites of each suite
+        :param steps: Steps of each test
+        :param keyword_depth: Depth of the keyword tree of each step
+        :param keyword_width: Child keywords of each keyword
+        :param fail_ratio: Fraction of the tests that fail
+        :param warn_ratio: Fraction of the leaf keywords that log a WARN message
+        :param screenshot_ratio: Fraction of the leaf keywords that capture a screenshot
+        :param test_execs: Number of JIRA_TESTEXEC keys, 0 to create the test executions
+        :param project: Jira project of the keys
+        :param screenshots: Number of distinct screenshot files
+        :param screenshot_bytes: Size of each screenshot file
+        :param seed: Seed of the failures and of the leaf keywords
+        """
+        self.tests = tests
+        self.suite_depth = suite_depth
+        self.suite_width = suite_width
+        self.steps = steps
+        self.keyword_depth = keyword_depth
+        self.keyword_width = keyword_width
+        self.fail_ratio = fail_ratio
+        self.warn_ratio = warn_ratio
+        self.screenshot_ratio = screenshot_ratio
+        self.test_execs = test_execs
+        self.project = project
+        self.screenshots = screenshots
+        self.screenshot_bytes = screenshot_bytes
+        self.random = random.Random(seed)
+        self._next_test = 0
+        self._next_screenshot = 0
+
+    def _leaf(self, path, failed):
+        if failed:
+            return _keyword('Element Should Be Visible', _msg('FAIL', 'Element \'id={}\' is not visible'.format(path)),
+                            'FAIL', ('id={}'.format(path),))
+        draw = self.random.random()
+        if draw < self.screenshot_ratio:
+            return self._screenshot()
+        if draw < self.screenshot_ratio + self.warn_ratio:
+            return _keyword('Log', _msg('WARN', 'Value of {} is deprecated'.format(path)), args=(
+                'Value of {} is deprecated'.format(path), 'WARN', 'html=False'), library='BuiltIn')
+        return _keyword('Click Element', args=('id={}'.format(path),))
+
+    def _screenshot(self):
+        self._next_screenshot = (self._next_screenshot + 1) % self.screenshots
+        return _screenshot(self._next_screenshot)
+
+    def _keyword_tree(self, name, depth, failed):
+        """
+        Keyword with its children, when failed the last child fails and so does the keyword
+        """
+        if not depth:
+            return self._leaf(name, failed)
+        children = ''.join(self._keyword_tree('{}.{}'.format(name, child), depth - 1,
+                                              failed and child == self.keyword_width - 1)
+                           for child in range(self.keyword_width))
+        return _keyword('Keyword {}'.format(name), children, 'FAIL' if failed else 'PASS', library='Resources')
+
+    def _test(self, index):
+        failed = self.random.random() < self.fail_ratio
+        failed_step = self.random.randrange(self.steps) if failed and self.steps else None
+
+        keywords = []
+        for step in range(self.steps):
+            keywords.append(self._keyword_tree('{}-{}'.format(index, step), self.keyword_depth, step == failed_step))
+            if step == failed_step:
+                break
+        teardown = self._screenshot() if failed else ''
+        keywords.append(_keyword('Close Browser', teardown, type='teardown'))
+
+        tags = ['JIRA_TEST:{}-{}'.format(self.project, index + 1), 'smoke' if index % 10 == 0 else 'regression']
+        if self.test_execs:
+            tags.append('JIRA_TESTEXEC:{}-{}'.format(self.project, self.tests + 1 + index % self.test_execs))
+        status = _status('FAIL', True, 'Element is not visible') if failed else _status('PASS', True)
+        return '<test id="t{0}" name="Test {0}">{1}<tags>{2}</tags>{3}</test>'.format(
+            index, ''.join(keywords), ''.join('<tag>{}</tag>'.format(tag) for tag in tags), status)
+
+    def _suite(self, output, name, depth, tests):
+        output.write('<suite id="{0}" name="{0}" source="{0}.robot">'.format(name))
+        if depth:
+            for child in range(self.suite_width):
+                # the tests left are shared by the child suites
+                child_tests = tests // self.suite_width + (1 if child < tests % self.suite_width else 0)
+                self._suite(output, '{}-S{}'.format(name, child), depth - 1, child_tests)
+        else:
+            for _ in range(tests):
+                output.write(self._test(self._next_test))
+                self._next_test += 1
+        output.write('{}</suite>'.format(_status('FAIL' if self.fail_ratio else 'PASS')))
+
+    def write(self, path):
+        """
+        Write the output file and its screenshot files
+
+        :param path: Path to the output file
+        """
+        with open(path, 'w') as output:
+            output.write('<?xml version="1.0" encoding="UTF-8"?>\n<robot generated="{}" generator="Robot 3.0.4">\n'
+                         .format(TIMESTAMP))
+            self._suite(output, 'Top', self.suite_depth, self.tests)
+            output.write('\n<statistics></statistics>\n<errors></errors>\n</robot>\n')
+
+        for index in range(self.screenshots):
+            with open(os.path.join(os.path.dirname(os.path.abspath(path)), SCREENSHOT_FILE.format(index)),
+                      'wb') as screenshot:
+                screenshot.write('\x89PNG\r\n\x1a\n' + os.urandom(self.screenshot_bytes))
+
+
+def write_output(path, tests=1000, **options):
+    """
+    Write a synthetic output file
+
+    :param path: Path to the output file
+    :param tests: Number of tests
+    :param options: Shape of the output, see OutputGenerator
+    """
+    OutputGenerator(tests, **options).write(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generator of synthetic Robot Framework output files')
+    parser.add_argument('output', help='Path to the output file')
+    parser.add_argument('--tests', type=int, default=1000)
+    parser.add_argument('--suite-depth', type=int, default=2)
+    parser.add_argument('--suite-width', type=int, default=3)
+    parser.add_argument('--steps', type=int, default=5)
+    parser.add_argument('--keyword-depth', type=int, default=2)
+    parser.add_argument('--keyword-width', type=int, default=2)
+    parser.add_argument('--fail-ratio', type=float, default=0.1)
+    parser.add_argument('--warn-ratio', type=float, default=0.2)
+    parser.add_argument('--screenshot-ratio', type=float, default=0.1)
+    parser.add_argument('--test-execs', type=int, default=2)
+    parser.add_argument('--project', default='GEN')
+    parser.add_argument('--screenshots', type=int, default=20)
+    parser.add_argument('--screenshot-bytes', type=int, default=16384)
+    parser.add_argument('--seed', type=int)
+    args = vars(parser.parse_args())
+
+    path = args.pop('output')
+    write_output(path, **args)
+    print '{} tests, {:.1f} MB'.format(args['tests'], os.path.getsize(path) / 1048576.0)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+    Local stub of the Jira and Xray endpoints used by rfw2xray_results.py, to run imports without a live Jira.
+
+    Implements the creation of issues (rest/api/2/issue), the import of test executions
+    (rest/raven/1.0/import/execution) and the link of test executions to test plans
+    (rest/raven/1.0/api/testplan/{key}/testexecution). Request bodies are read whole, chunked or not, gzip
+    compressed or not, and the import bodies are parsed as JSON. Each request can be delayed, failed with a 500,
+    throttled with a 429 and a Retry-After header, answered unavailable with a 503 and a Retry-After header, or
+    failed by the gateway with a 502 or a 504. Compressed requests can be rejected with a 415, as by a server that
+    does not accept gzip. The stub counts the requests and the bytes received.
+
+        python benchmarks/xray_stub.py [--port 8080] [--latency 0.05] [--error-rate 0.01] [--throttle-rate 0.05]
+                                       [--unavailable-rate 0.01] [--gateway-error-rate 0.01] [--reject-gzip]
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+ISSUE_PATH = re.compile(r'/rest/api/2/issue/?$')
+IMPORT_PATH = re.compile(r'/rest/raven/1\.0/import/execution/?$')
+TEST_PLAN_PATH = re.compile(r'/rest/raven/1\.0/api/testplan/([^/]+)/testexecution/?$')
+
+
+class StubStats(object):
+    """
+    Requests received by the stub
+    """
+
+    def __init__(self):
+        self.requests = 0
+        # bytes of the request bodies, as received
+        self.body_bytes = 0
+        self.tests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.unavailable = 0
+        self.gateway_errors = 0
+        self.gzip_rejected = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+
+class XrayStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(';')[0].strip(), 16)
+                if not size:
+                    # trailer
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = ''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.stats.add(requests=1, body_bytes=len(body))
+
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        return body
+
+    def _send_json(self, code, content, headers=()):
+        data = json.dumps(content)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        body = self._read_body()
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.reject_gzip and self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            server.stats.add(gzip_rejected=1)
+            self._send_json(415, {'errorMessages': ['Unsupported content encoding gzip']})
+            return
+
+        draw = server.random()
+        if draw < server.throttle_rate:
+            server.stats.add(throttled=1)
+            self._send_json(429, {'errorMessages': ['Too many requests']},
+                            [('Retry-After', str(server.retry_after))])
+            return
+        draw -= server.throttle_rate
+        if draw < server.unavailable_rate:
+            server.stats.add(unavailable=1)
+            self._send_json(503, {'errorMessages': ['Service unavailable']},
+                            [('Retry-After', str(server.retry_after))])
+            return
+        draw -= server.unavailable_rate
+        if draw < server.gateway_error_rate:
+            server.stats.add(gateway_errors=1)
+            self._send_json(502 if server.random() < 0.5 else 504, {'errorMessages': ['Injected gateway error']})
+            return
+        draw -= server.gateway_error_rate
+        if draw < server.error_rate:
+            server.stats.add(errors=1)
+            self._send_json(500, {'errorMessages': ['Injected error']})
+            return
+
+        if ISSUE_PATH.search(self.path):
+            project = json.loads(body)['fields']['project']['key']
+            self._send_json(201, {'key': '{}-{}'.format(project, server.next_issue())})
+        elif IMPORT_PATH.search(self.path):
+            test_exec = json.loads(body)
+            server.stats.add(tests=len(test_exec.get('tests', ())))
+            self._send_json(200, {'testExecIssue': {'key': test_exec.get('testExecutionKey')}})
+        elif TEST_PLAN_PATH.search(self.path):
+            self._send_json(200, [])
+        else:
+            self._send_json(404, {'errorMessages': ['Unknown endpoint {}'.format(self.path)]})
+
+
+class XrayStub(ThreadingMixIn, HTTPServer):
+    """
+    Stub server, each request is handled by its own thread
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=None,
+                 unavailable_rate=0.0, gateway_error_rate=0.0, reject_gzip=False):
+        """
+        :param port: Port to listen to on localhost, 0 for any free port
+        :param latency: Delay of each response, in seconds
+        :param error_rate: Fraction of the requests failed with a 500
+        :param throttle_rate: Fraction of the requests throttled with a 429
+        :param retry_after: Retry-After of the throttled and unavailable requests, in seconds
+        :param seed: Seed of the injected errors and throttling
+        :param unavailable_rate: Fraction of the requests answered with a 503
+        :param gateway_error_rate: Fraction of the requests failed with a 502 or a 504
+        :param reject_gzip: True to reject the gzip compressed requests with a 415
+        """
+        HTTPServer.__init__(self, ('127.0.0.1', port), XrayStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.gateway_error_rate = gateway_error_rate
+        self.reject_gzip = reject_gzip
+        self.retry_after = retry_after
+        self.stats = StubStats()
+        self._random = random.Random(seed)
+        self._issues = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def next_issue(self):
+        with self._lock:
+            self._issues += 1
+            return self._issues
+
+    def start(self):
+        """
+        Serve in a daemon thread
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stub of the Jira and Xray import endpoints')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay of each response, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of the requests failed with a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Fraction of the requests throttled with a 429')
+    parser.add_argument('--unavailable-rate', type=float, default=0.0,
+                        help='Fraction of the requests answered with a 503 and a Retry-After header')
+    parser.add_argument('--gateway-error-rate', type=float, default=0.0,
+                        help='Fraction of the requests failed with a 502 or a 504')
+    parser.add_argument('--reject-gzip', action='store_true', help='Reject the gzip compressed requests with a 415')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='Retry-After of the throttled and unavailable requests')
+    parser.add_argument('--seed', type=int, help='Seed of the injected errors and throttling')
+    args = parser.parse_args()
+
+    stub = XrayStub(args.port, args.latency, args.error_rate, args.throttle_rate, args.retry_after, args.seed,
+                    args.unavailable_rate, args.gateway_error_rate, args.reject_gzip)
+    print 'Xray stub listening on {}'.format(stub.url)
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    stats = stub.stats
+    print '{} requests, {} bytes, {} tests, {} errors, {} throttled, {} unavailable, {} gateway errors, ' \
+          '{} gzip rejected'.format(stats.requests, stats.body_bytes, stats.tests, stats.errors, stats.throttled,
+                                    stats.unavailable, stats.gateway_errors, stats.gzip_rejected)
@@ -29,7 +29,8 @@ EPILOG = "\n\n\nExamples: \n" \
 
 # Positional Arguments
 FILE = 'file'
-FILE_HELP = 'Robot Framework output XML file'
+FILE_HELP = 'Robot Framework output XML files, or glob patterns of output files (e.g. "results/*/output.xml"). ' \
+            'Test executions with the same key are merged'
 
 URL = 'url'
 URL_HELP = 'Jira\'s url'
@@ -165,6 +166,167 @@ CERTIFICATE_HELP = 'Set path to SSL certificate. If value not set, there will no
                    'Exposing this application to security risks.\n'\
                    'Example: -c "/PATH/TO/CERTIFICATE"'
 
+EVIDENCE_CACHE = '-ec'
+EVIDENCE_CACHE_EXTENDED = '--evidence-cache'
+EVIDENCE_CACHE_DEFAULT = 64 * 1024 * 1024
+EVIDENCE_CACHE_TYPE = int
+EVIDENCE_CACHE_HELP = 'Maximum memory, in bytes, used to keep encoded evidences, so that an evidence referenced more than ' \
+                      'once is read from disk and encoded only once.\n' \
+                      'Default value is 67108864 (64 MB)'
+
+EVIDENCE_WORKERS = '-ew'
+EVIDENCE_WORKERS_EXTENDED = '--evidence-workers'
+EVIDENCE_WORKERS_DEFAULT = 8
+EVIDENCE_WORKERS_TYPE = int
+EVIDENCE_WORKERS_HELP = 'Number of threads that read and encode evidences while the output file is parsed. ' \
+                        'With 0, evidences are only read while the test execution is sent.\n' \
+                        'Default value is 8'
+
+MAX_PAYLOAD_BYTES = '-mpb'
+MAX_PAYLOAD_BYTES_EXTENDED = '--max-payload-bytes'
+MAX_PAYLOAD_BYTES_TYPE = int
+MAX_PAYLOAD_BYTES_HELP = 'Split the import of a test execution in several requests of at most this estimated size, ' \
+                         'evidences included. The first request creates or updates the test execution and the ' \
+                         'following ones add their tests to it. By default all tests are imported in one request.\n' \
+                         'Example: -mpb 52428800'
+
+UPLOAD_CONCURRENCY = '-uc'
+UPLOAD_CONCURRENCY_EXTENDED = '--upload-concurrency'
+UPLOAD_CONCURRENCY_DEFAULT = 4
+UPLOAD_CONCURRENCY_TYPE = int
+UPLOAD_CONCURRENCY_HELP = 'Number of test executions imported at the same time. Test executions that fail to import ' \
+                          'do not stop the others.\n' \
+                          'Default value is 4'
+
+COMPRESS = '-gz'
+COMPRESS_EXTENDED = '--compress'
+COMPRESS_ACTION = 'store_true'
+COMPRESS_HELP = 'Gzip compress the import requests, with Content-Encoding: gzip. If Jira rejects the first ' \
+                'compressed request, it is sent again uncompressed and the following requests are not compressed.'
+
+MAX_RETRIES = '-mr'
+MAX_RETRIES_EXTENDED = '--max-retries'
+MAX_RETRIES_DEFAULT = 5
+MAX_RETRIES_TYPE = int
+MAX_RETRIES_HELP = 'Number of times a request throttled or failed by Jira (429, 502, 503, 504) or by the connection ' \
+                   'is retried, after a random exponential backoff or the delay given by its Retry-After header.\n' \
+                   'Default value is 5'
+
+RETRY_BUDGET = '-rb'
+RETRY_BUDGET_EXTENDED = '--retry-budget'
+RETRY_BUDGET_DEFAULT = 50
+RETRY_BUDGET_TYPE = int
+RETRY_BUDGET_HELP = 'Maximum number of retries of all the requests of the run, so that an unavailable Jira does ' \
+                    'not hold the import for long.\n' \
+                    'Default value is 50'
+
+RATE_LIMIT = '-rl'
+RATE_LIMIT_EXTENDED = '--rate-limit'
+RATE_LIMIT_TYPE = float
+RATE_LIMIT_HELP = 'Maximum number of requests per second sent to each host. By default requests are not limited.\n' \
+                  'Example: -rl 2.5'
+
+MAX_COMMENT_BYTES = '-mcb'
+MAX_COMMENT_BYTES_EXTENDED = '--max-comment-bytes'
+MAX_COMMENT_BYTES_TYPE = int
+MAX_COMMENT_BYTES_HELP = 'Truncate the comment of each test step, with its error and log messages, to this size.\n' \
+                         'Example: -mcb 32768'
+
+UTC_OFFSET = '-tz'
+UTC_OFFSET_EXTENDED = '--utc-offset'
+UTC_OFFSET_DEFAULT = '+01:00'
+UTC_OFFSET_HELP = 'UTC offset of the Robot Framework timestamps, either +HH:MM, -HH:MM or \"local\" to use the ' \
+                  'timezone of this machine, daylight saving time included.\n' \
+                  'Default value is +01:00'
+
+PARSE_WORKERS = '-psw'
+PARSE_WORKERS_EXTENDED = '--parse-workers'
+PARSE_WORKERS_TYPE = int
+PARSE_WORKERS_HELP = 'Number of processes parsing the output files at the same time, 1 to parse them one after ' \
+                     'the other.\nDefault value is the number of CPUs'
+
+TEST_WORKERS = '-tw'
+TEST_WORKERS_EXTENDED = '--test-workers'
+TEST_WORKERS_DEFAULT = 1
+TEST_WORKERS_TYPE = int
+TEST_WORKERS_HELP = 'Number of processes parsing the steps and evidences of the tests of an output file, while ' \
+                    'the file is read. Used when the output files are parsed one after the other, e.g. for a ' \
+                    'single big output file.\nDefault value is 1, the tests are parsed while the file is read'
+
+PARSER_ENGINE = '-pe'
+PARSER_ENGINE_EXTENDED = '--parser-engine'
+PARSER_ENGINE_TREE = 'tree'
+PARSER_ENGINE_TARGET = 'target'
+PARSER_ENGINE_CHOICES = (PARSER_ENGINE_TREE, PARSER_ENGINE_TARGET)
+PARSER_ENGINE_DEFAULT = PARSER_ENGINE_TREE
+PARSER_ENGINE_HELP = 'Engine parsing the output file, both import the same tests:\n' \
+                     '\ttree: each test is parsed into an XML tree\n' \
+                     '\ttarget: the tests are read from the parser events, without building an XML tree\n' \
+                     'Default value is tree'
+
+INCREMENTAL = '-inc'
+INCREMENTAL_EXTENDED = '--incremental'
+INCREMENTAL_ACTION = 'store_true'
+INCREMENTAL_HELP = 'Only import the tests whose result changed since the last successful import to the same test ' \
+                   'execution: its status, start and finish dates or evidences. The imported results are kept in ' \
+                   'a local cache. Test executions that are created by the import are always imported whole.'
+
+INCREMENTAL_CACHE_FILE = '-icf'
+INCREMENTAL_CACHE_FILE_EXTENDED = '--incremental-cache-file'
+INCREMENTAL_CACHE_FILE_DEFAULT = '.rfw2xray_cache.sqlite'
+INCREMENTAL_CACHE_FILE_HELP = 'SQLite file of the incremental import cache.\n' \
+                              'Default value is .rfw2xray_cache.sqlite'
+
+INCREMENTAL_CACHE_SIZE = '-ics'
+INCREMENTAL_CACHE_SIZE_EXTENDED = '--incremental-cache-size'
+INCREMENTAL_CACHE_SIZE_DEFAULT = 100000
+INCREMENTAL_CACHE_SIZE_TYPE = int
+INCREMENTAL_CACHE_SIZE_HELP = 'Maximum number of test results kept in the incremental import cache, the least ' \
+                              'recently imported are evicted first.\n' \
+                              'Default value is 100000'
+
+RESUME = '-rs'
+RESUME_EXTENDED = '--resume'
+RESUME_ACTION = 'store_true'
+RESUME_HELP = 'Resume a run whose test executions failed to import, with the same output files and options. ' \
+              'Test execution issues already created are reused and results already imported are not sent again. ' \
+              'The run records its own journal, so it can be resumed in turn.'
+
+JOURNAL_FILE = '-jf'
+JOURNAL_FILE_EXTENDED = '--journal-file'
+JOURNAL_FILE_NARGS = '?'
+JOURNAL_FILE_CONST = '.rfw2xray_journal'
+JOURNAL_FILE_HELP = 'Record a journal of the imports done by the run, read by --resume if the run fails. It is ' \
+                    'deleted once every test execution is imported. Without this option nor --resume, no journal ' \
+                    'is recorded.\n' \
+                    'Default value is .rfw2xray_journal'
+
+PROFILE = '-pf'
+PROFILE_EXTENDED = '--profile'
+PROFILE_NARGS = '?'
+PROFILE_CONST = 'rfw2xray_profile.json'
+PROFILE_HELP = 'Time the phases of the import (parse, steps, evidence read and encode, serialization, OAuth ' \
+               'signing, HTTP requests), count the tests, steps, evidences and bytes, and write them in a JSON ' \
+               'report at exit.\n' \
+               'Default report file is rfw2xray_profile.json'
+
+PROFILE_CPU = '-pfc'
+PROFILE_CPU_EXTENDED = '--profile-cpu'
+PROFILE_CPU_ACTION = 'store_true'
+PROFILE_CPU_HELP = 'With --profile, run cProfile in the main thread and add its hottest functions to the report. ' \
+                   'The whole profile is dumped next to the report, with the .pstats extension.'
+
+PROFILE_MEMORY = '-pfm'
+PROFILE_MEMORY_EXTENDED = '--profile-memory'
+PROFILE_MEMORY_ACTION = 'store_true'
+PROFILE_MEMORY_HELP = 'With --profile, trace the allocations with tracemalloc, when the interpreter provides it, ' \
+                      'and add the peak traced memory and the biggest allocations by line to the report.'
+
+TRANSLATOR = '-tr'
+TRANSLATOR_EXTENDED = '--translator'
+TRANSLATOR_HELP = 'JSON file of the translator of the records to the Xray JSON, e.g. testexec_translator.json. It is ' \
+                  'validated when the import starts. By default the translator embedded in testexec_builder.py is used.'
+
 COMPONENTS = '-co'
 COMPONENTS_EXTENDED = '--components'
 COMPONENTS_HELP = 'Jira components to add to test exec'
@@ -198,6 +360,10 @@ NO_TESTEXEC_KEY = '-1'
 TEST_TAG = 'test'
 SUITE_TAG = 'suite'
 STATUS_TAG = 'status'
+TAGS_TAG = 'tags'
+TAG_TAG = 'tag'
+ARGUMENTS_TAG = 'arguments'
+ARG_TAG = 'arg'
 KW_TAG = 'kw'
 MSG_TAG = 'msg'
 
@@ -214,17 +380,25 @@ NO_VALUE = 'N/A'
 SETUP = 'setup'
 TEARDOWN = 'teardown'
 
+# ITERPARSE EVENTS
+START_EVENT = 'start'
+END_EVENT = 'end'
+ITERPARSE_EVENTS = (START_EVENT, END_EVENT)
+# Tests sent at a time to a test worker, and batches sent to each test worker before waiting for the first one
+TEST_BATCH_SIZE = 16
+TEST_BATCHES_PER_WORKER = 4
+# Bytes read at a time from the output file when its keywords are skipped
+PARSER_CHUNK_SIZE = 1024 * 1024
+# Start, end or empty keyword tag: group 1 is '/' for an end tag, group 2 is '/' for an empty tag
+KEYWORD_TAG_REGEX = r'<(/?)kw\b[^>]*?(/?)>'
+# Start, end or empty test or suite tag: groups are the '/' of an end tag, the tag and the '/' of an empty tag
+TEST_SUITE_TAG_REGEX = r'<(/?)(test|suite)\b[^>]*?(/?)>'
+
 ## XPATH
-# XPATH TO CLEAR MEMORY
-XPATH_ANCESTOR = 'ancestor-or-self::*'
 # XPATH TO GET TEST TAGS TEXT
 XPATH_TAG_TEXT = 'tags/tag/text()'
-# XPATH TO FIND EVIDENCE MSG
-XPATH_EVIDENCE_MSG = 'msg[@level="INFO"]'
 # XPATH TO GET ARGUMENTS FROM LOG
 XPATH_LOG_ARGS = 'arguments/arg'
-#XPATH TO GET FIRST SUITE
-XPATH_ANCESTOR_SUITE = 'ancestor::suite'
 # TEST TAG SEPARATOR
 TEST_TAG_SEPARATOR = ':'
 
@@ -238,9 +412,13 @@ TEST_EXECUTION_SUMMARY = 'Test Execution {}'
 FAIL = 'FAIL'
 
 # LOG LEVEL
+INFO = 'INFO'
 WARN = 'WARN'
 ERROR = 'ERROR'
 
+# END OF A TRUNCATED STEP COMMENT
+COMMENT_TRUNCATED = '[...]\n'
+
 # REGEX TO GET EVIDENCE SOURCE
 SRC_REGEX = 'img src="(.*?)"'
 
@@ -248,14 +426,81 @@ SRC_REGEX = 'img src="(.*?)"'
 
 # ROBOT FRAMEWORK FORMAT
 DATE_ROBOT_FRAMEWORK_FORMAT = '%Y%m%d %H:%M:%S.%f'
-# XRAY FORMAT
-DATE_XRAY_FORMAT = '%Y-%m-%dT%H:%M:%S+01:00'
+# XRAY FORMAT, formatted with year, month, day, hour, minute, second and UTC offset
+DATE_XRAY_FORMAT = '{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}{}'
+# Number of seconds whose XRAY date is kept
+TIMESTAMP_CACHE_SIZE = 100000
+TIMESTAMP_ERROR_MSG = 'Invalid Robot Framework timestamp: \"{}\"'
+
+# UTC OFFSET
+UTC_OFFSET_REGEX = r'^[+-]\d\d:\d\d$'
+UTC_OFFSET_LOCAL = 'local'
+UTC_OFFSET_ERROR_MSG = 'Invalid UTC offset: \"{}\". Use +HH:MM, -HH:MM or local'
 
 ## SEND REQUEST
 
 # HEADERS
 CONTENT_TYPE = "Content-Type"
 CONTENT_TYPE_JSON = "application/json"
+CONTENT_ENCODING = "Content-Encoding"
+CONTENT_ENCODING_GZIP = "gzip"
+
+# COMPRESSION
+GZIP_LEVEL = 6
+# gzip header and trailer around the deflate stream
+GZIP_WBITS = 16 + 15
+# Status codes of a server that does not accept compressed bodies. Not 400, that Xray also returns for invalid
+# results, e.g. an unknown test key
+COMPRESSION_REJECTED_STATUS_CODES = frozenset([415])
+COMPRESSION_REJECTED_MSG = 'Compressed request rejected with {}, sent uncompressed'
+
+# STREAMED REQUEST BODY
+# Minimum size of each chunk written to the request body
+STREAM_CHUNK_SIZE = 64 * 1024
+# Bytes of a signed request body kept in memory while it is spooled, bigger bodies are spooled to a temporary file
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+# Bytes read at a time from an evidence file (multiple of 3, so each block is base64 encoded on its own)
+EVIDENCE_READ_BLOCK_SIZE = 3 * 16 * 1024
+
+# CONNECTION POOL
+# Number of hosts with pooled connections
+HTTP_POOL_CONNECTIONS = 4
+
+# INCREMENTAL IMPORT
+INCREMENTAL_UP_TO_DATE_MSG = 'Test execution {} is up to date, no test to import'
+INCREMENTAL_SKIPPED_MSG = 'Skip {} unchanged tests of test execution {}'
+
+# UPLOAD JOURNAL
+JOURNAL_NOT_RESUMED_MSG = 'No journal of this run to resume in {}, every test execution is imported'
+JOURNAL_RESUME_MSG = 'Import failed, run again with {} to resume it'
+JOURNAL_DISABLED_MSG = 'Import failed. Runs with {} or {} record a journal of their imports, to be resumed'
+
+# RETRIES
+# Status codes of the responses retried
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+# Status codes of the responses to requests not processed by the server, retried even if they are not idempotent.
+# A 503 is only retried with a Retry-After header
+RETRY_UNPROCESSED_STATUS_CODES = frozenset([429])
+RETRY_UNAVAILABLE_STATUS_CODE = 503
+RETRY_AFTER = 'Retry-After'
+# Delay of the first retry, doubled at each retry, and maximum delay, in seconds
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 60.0
+# Maximum delay asked by a Retry-After header, in seconds
+RETRY_AFTER_MAX = 300.0
+# Requests sent at once to a rate limited host
+RATE_LIMIT_BURST = 1
+RETRY_MSG = 'Retry {} in {:.2f}s after {}'
+
+# PROFILE
+# Functions and allocation lines in the report
+PROFILE_TOP = 25
+PROFILE_CPU_EXTENSION = '.pstats'
+PROFILE_MSG = 'Profile report written to {}'
+PROFILE_MEMORY_UNAVAILABLE_MSG = 'tracemalloc is not available in this interpreter, allocations are not traced'
+
+# UPLOAD ERROR MESSAGE
+UPLOAD_ERROR_MSG = 'Error importing test execution {}: {}'
 
 #OAUTH EXCEPTION MESSAGE
 OAUTH_EXCEPTION_MSG = 'Error in communicating via OAuth.\nError code: {} - {}'
@@ -268,11 +513,42 @@ KEY = 'key'
 ##DEBUG LOG
 DEBUG_UPDATE = 'Update {} tests of test execution {}. Test keys: {}'
 DEBUG_CREATE = 'Create a new test execution with name: \"{}\" and \"{}\" tests. Test keys: {}'
+DEBUG_DUMP_FILE = 'dump_{}.json'
+
 
 
 
 
 
+###### Incremental import cache constants
+CACHE_CREATE_TABLE = 'CREATE TABLE IF NOT EXISTS imported_tests (' \
+                     'testexec_key TEXT NOT NULL, test_key TEXT NOT NULL, status TEXT, start TEXT, finish TEXT, ' \
+                     'evidence_hash TEXT, imported REAL NOT NULL, PRIMARY KEY (testexec_key, test_key))'
+CACHE_CREATE_INDEX = 'CREATE INDEX IF NOT EXISTS imported_tests_imported ON imported_tests (imported)'
+CACHE_SELECT = 'SELECT test_key, status, start, finish, evidence_hash FROM imported_tests WHERE testexec_key = ?'
+CACHE_UPSERT = 'INSERT OR REPLACE INTO imported_tests ' \
+               '(testexec_key, test_key, status, start, finish, evidence_hash, imported) VALUES (?, ?, ?, ?, ?, ?, ?)'
+CACHE_COUNT = 'SELECT COUNT(*) FROM imported_tests'
+CACHE_EVICT = 'DELETE FROM imported_tests WHERE rowid IN ' \
+              '(SELECT rowid FROM imported_tests ORDER BY imported LIMIT ?)'
+
+
+###### Upload journal constants
+JOURNAL_RUN = 'run'
+JOURNAL_KEY = 'key'
+JOURNAL_STEP = 'step'
+JOURNAL_VALUE = 'value'
+JOURNAL_PART = 'part'
+# steps of the import of a test execution
+JOURNAL_CREATED = 'created'
+JOURNAL_IMPORTED = 'imported'
+JOURNAL_LINKED = 'linked'
+# options that do not change what is imported
+JOURNAL_RUN_IGNORED_OPTIONS = ('resume', 'journal_file', 'debug', 'evidence_cache', 'evidence_workers',
+                               'upload_concurrency', 'parse_workers', 'test_workers', 'parser_engine', 'max_retries',
+                               'retry_budget', 'rate_limit', 'compress', 'profile', 'profile_cpu',
+                               'profile_memory')
+
 
 ###### Test Execution Builder constants
 TESTEXECUTIONKEY = 'testexec_key'
@@ -306,5 +582,10 @@ STEP_STATUS = 'step_status'
 STEP_COMMENT = 'step_comment'
 STEP_EVIDENCES = 'step_evidences'
 
+# TRANSLATOR ERROR MESSAGES
+TRANSLATOR_PATH_ERROR_MSG = 'Invalid translator path: \"{}\"'
+TRANSLATOR_MISSING_ERROR_MSG = 'Translator is missing: {}'
+TRANSLATOR_LOAD_ERROR_MSG = 'Invalid translator file {}: {}'
+
 # OAuth
 OAUTH_CONFIG_FILE = './auth.conf'
\ No newline at end of file
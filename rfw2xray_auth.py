@@ -1,31 +1,85 @@
 import base64
+import os
+import threading
 import urlparse
 from tlslite.utils import keyfactory
 import oauth2 as oauth
 import configparser
 import constants
+import rfw2xray_profile
 
 
-config = configparser.ConfigParser()
+# signature methods by private key path, so a key is parsed once per process
+_signature_methods = {}
+_signature_methods_lock = threading.Lock()
 
 
 def create_oauth_client(config_file):
     try:
-        global config
-        #print config_file
+        config = configparser.ConfigParser()
         config.read(config_file)
         consumer = oauth.Consumer(config['DEFAULT']['CONSUMER_KEY'], config['DEFAULT']['PRIVATE_KEY'])
         accessToken = oauth.Token(config['DEFAULT']['ACCESS_TOKEN'], config['DEFAULT']['SECRET'])
         client = oauth.Client(consumer, accessToken)
-        client.set_signature_method(SignatureMethod_RSA_SHA1())
+        client.set_signature_method(_get_signature_method(config['DEFAULT']['JIRA_PRIVATE_KEY_PATH']))
         return client
     except Exception as e:
         print 'Error on OAuth: ' + e.message
         return None
 
+
+def _get_signature_method(private_key_path):
+    with _signature_methods_lock:
+        signature_method = _signature_methods.get(private_key_path)
+        if signature_method is None:
+            signature_method = _signature_methods[private_key_path] = SignatureMethod_RSA_SHA1(private_key_path)
+        return signature_method
+
+
+def sign_streamed_request(client, url, method, body_hash):
+    """
+    Sign a request whose body is streamed instead of held in memory
+
+    :param client: OAuth client
+    :param url: Request url
+    :param method: HTTP method
+    :param body_hash: SHA-1 digest of the request body, computed while the body is spooled
+    :return: Dict with the OAuth Authorization header
+    """
+    # is_form_encoded stops oauth2 from hashing the (empty) body by itself
+    with rfw2xray_profile.timer('oauth_sign'):
+        request = oauth.Request.from_consumer_and_token(client.consumer, token=client.token, http_method=method,
+                                                        http_url=url, is_form_encoded=True)
+        request['oauth_body_hash'] = base64.b64encode(body_hash)
+        request.sign_request(client.method, client.consumer, client.token)
+
+    scheme, netloc = urlparse.urlparse(url)[:2]
+    return request.to_header(realm=urlparse.urlunparse((scheme, netloc, '', None, None, None)))
+
 class SignatureMethod_RSA_SHA1(oauth.SignatureMethod):
     name = 'RSA-SHA1'
 
+    def __init__(self, private_key_path):
+        """
+        :param private_key_path: Path to the PEM private key used to sign requests
+        """
+        self.private_key_path = private_key_path
+        self._private_key = None
+        self._private_key_stat = None
+        # tlslite keys update their blinding values on every signature, so signing is serialized
+        self._lock = threading.Lock()
+
+    def _load_private_key(self):
+        """Parse the private key, only if it was not parsed yet or the key file has changed."""
+        stat = os.stat(self.private_key_path)
+        private_key_stat = (stat.st_size, stat.st_mtime)
+        if self._private_key is None or private_key_stat != self._private_key_stat:
+            with open(self.private_key_path, 'r') as f:
+                data = f.read()
+            self._private_key = keyfactory.parsePrivateKey(data.strip())
+            self._private_key_stat = private_key_stat
+        return self._private_key
+
     def signing_base(self, request, consumer, token):
         if not hasattr(request, 'normalized_url') or request.normalized_url is None:
             raise ValueError("Base URL for request is not set.")
@@ -46,11 +100,7 @@ class SignatureMethod_RSA_SHA1(oauth.SignatureMethod):
         """Builds the base signature string."""
         key, raw = self.signing_base(request, consumer, token)
 
-        with open(config['DEFAULT']['JIRA_PRIVATE_KEY_PATH'], 'r') as f:
-            data = f.read()
-        privateKeyString = data.strip()
-
-        privatekey = keyfactory.parsePrivateKey(privateKeyString)
-        signature = privatekey.hashAndSign(raw)
+        with self._lock:
+            signature = self._load_private_key().hashAndSign(raw)
 
         return base64.b64encode(signature)
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+    Incremental import cache.
+
+    A SQLite file keeps, for each test execution and test, the result last imported successfully: its status, start
+    and finish dates and a hash of its evidences, identified by path, size and modification time as in the evidence
+    store. Importing the same output again, e.g. when a job is retried, only sends the tests whose result changed.
+    The cache keeps a bounded number of results, the least recently imported are evicted first.
+"""
+import sqlite3
+import threading
+import time
+from hashlib import sha1
+
+import constants
+
+
+def iter_evidences(test):
+    """
+    Yield the evidence files of a test case and of its steps
+    """
+    for evidence in test.evidences or ():
+        yield evidence.data
+    for step in test.steps:
+        for evidence in step.evidences:
+            yield evidence.data
+
+
+def evidence_hash(test):
+    """
+    :param test: TestCase
+    :return: Hash of the identities of the evidences of the test, None if it has no evidence
+    """
+    digest = None
+    for evidence in iter_evidences(test):
+        if digest is None:
+            digest = sha1()
+        digest.update(repr(evidence.key or evidence.path))
+    return digest.hexdigest() if digest is not None else None
+
+
+def fingerprint(test):
+    """
+    :param test: TestCase
+    :return: (status, start, finish, evidence hash) of the test
+    """
+    return test.status, test.start, test.finish, evidence_hash(test)
+
+
+class ImportCache(object):
+    """
+    Results of the tests imported successfully, by test execution key and test key
+    """
+
+    def __init__(self, path=constants.INCREMENTAL_CACHE_FILE_DEFAULT,
+                 max_tests=constants.INCREMENTAL_CACHE_SIZE_DEFAULT):
+        """
+        :param path: Path to the SQLite file, created if needed
+        :param max_tests: Maximum number of test results kept
+        """
+        self.max_tests = max_tests
+        # test executions are imported by concurrent threads
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(constants.CACHE_CREATE_TABLE)
+            self._connection.execute(constants.CACHE_CREATE_INDEX)
+
+    def changed_tests(self, testexec_key, tests):
+        """
+        Select the tests whose result is not the one last imported to a test execution
+
+        :param testexec_key: Test execution key
+        :param tests: List of TestCase
+        :return: List of the changed TestCase, in the same order
+        """
+        with self._lock:
+            imported = dict((row[0], tuple(row[1:]))
+                            for row in self._connection.execute(constants.CACHE_SELECT, (testexec_key,)))
+        return [test for test in tests if imported.get(test.testKey) != fingerprint(test)]
+
+    def record(self, testexec_key, tests):
+        """
+        Keep the results of tests imported successfully, evicting the least recently imported results over the
+        maximum number of tests
+
+        :param testexec_key: Test execution key
+        :param tests: List of TestCase
+        """
+        imported = time.time()
+        rows = [(testexec_key, test.testKey) + fingerprint(test) + (imported,) for test in tests]
+        with self._lock, self._connection:
+            self._connection.executemany(constants.CACHE_UPSERT, rows)
+            count = self._connection.execute(constants.CACHE_COUNT).fetchone()[0]
+            if count > self.max_tests:
+                self._connection.execute(constants.CACHE_EVICT, (count - self.max_tests,))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
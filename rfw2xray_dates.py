@@ -0,0 +1,86 @@
+"""
+    Conversion of Robot Framework timestamps to XRAY dates.
+
+    Robot Framework timestamps have a fixed format, '20180830 11:47:35.123', so they are converted by slicing and
+    integer parsing instead of datetime.strptime. Tests of a run share most of their timestamps up to the second,
+    so the XRAY date of each second is computed once.
+"""
+import re
+import time
+from argparse import ArgumentTypeError
+from datetime import datetime
+
+import constants
+
+
+UTC_OFFSET_REGEX = re.compile(constants.UTC_OFFSET_REGEX)
+
+
+def utc_offset(value):
+    """
+    Argument type of the UTC offset option
+
+    :param value: UTC offset, "+HH:MM", "-HH:MM" or "local"
+    :return: The UTC offset
+    """
+    if value != constants.UTC_OFFSET_LOCAL and not UTC_OFFSET_REGEX.match(value):
+        raise ArgumentTypeError(constants.UTC_OFFSET_ERROR_MSG.format(value))
+    return value
+
+
+def local_utc_offset(date):
+    """
+    UTC offset of the local timezone at a date, daylight saving time included
+
+    :param date: Naive local datetime
+    :return: UTC offset, "+HH:MM" or "-HH:MM"
+    """
+    timestamp = time.mktime(date.timetuple())
+    offset = datetime.fromtimestamp(timestamp) - datetime.utcfromtimestamp(timestamp)
+    minutes = (offset.days * 86400 + offset.seconds) // 60
+    sign = '+' if minutes >= 0 else '-'
+    return '{}{:02d}:{:02d}'.format(sign, abs(minutes) // 60, abs(minutes) % 60)
+
+
+class TimestampConverter(object):
+    """
+    Converts Robot Framework timestamps to XRAY dates, memoized by second
+    """
+
+    def __init__(self, offset=constants.UTC_OFFSET_DEFAULT, max_cached=constants.TIMESTAMP_CACHE_SIZE):
+        """
+        :param offset: UTC offset of the timestamps, "+HH:MM", "-HH:MM" or "local" to use the local timezone
+        :param max_cached: Maximum number of seconds kept, the cache is cleared when it is full
+        """
+        self.offset = utc_offset(offset)
+        self.max_cached = max_cached
+        self._dates = {}
+
+    def convert(self, timestamp):
+        """
+        Convert a Robot Framework timestamp
+
+        :param timestamp: Robot Framework timestamp, e.g. "20180830 11:47:35.123"
+        :return: XRAY date, e.g. "2018-08-30T11:47:35+01:00"
+        :raise: ValueError if the timestamp does not have Robot Framework's format
+        """
+        second = timestamp[:17]
+        date = self._dates.get(second)
+        if date is None or timestamp[17:18] != '.':
+            date = self._convert_second(timestamp)
+            if len(self._dates) >= self.max_cached:
+                self._dates.clear()
+            self._dates[second] = date
+        return date
+
+    def _convert_second(self, timestamp):
+        if timestamp[8:9] != ' ' or timestamp[11:12] != ':' or timestamp[14:15] != ':' or timestamp[17:18] != '.':
+            raise ValueError(constants.TIMESTAMP_ERROR_MSG.format(timestamp))
+
+        # datetime validates the ranges of the values
+        date = datetime(int(timestamp[0:4]), int(timestamp[4:6]), int(timestamp[6:8]),
+                        int(timestamp[9:11]), int(timestamp[12:14]), int(timestamp[15:17]))
+
+        offset = self.offset if self.offset != constants.UTC_OFFSET_LOCAL else local_utc_offset(date)
+        return constants.DATE_XRAY_FORMAT.format(date.year, date.month, date.day, date.hour, date.minute,
+                                                 date.second, offset)
@@ -0,0 +1,52 @@
+"""
+    Filters of the tests to import.
+
+    The tag, test case and test suite filters are compiled once in sets, and each test is checked with its name, its
+    tags and whether it is inside a suite of the suite filter, which are read before its steps. The parser flags the
+    tests inside the filtered suites when the suites start, so the suite filter costs the same whatever the depth of
+    the suites. Tests rejected by the filters are not parsed any further, so importing a few tests of a big output
+    file costs little more than reading it.
+"""
+import constants
+
+
+class TestFilter(object):
+    """
+    Tag, test case and test suite filters, combined with AND or OR
+    """
+
+    def __init__(self, import_filters, filter_option=constants.FILTER_OPTION_DEFAULT):
+        """
+        :param import_filters: Lists of tags, test case names and test suite names, by filter key
+        :param filter_option: Filter option, AND for the tests matching every filter, otherwise the tests matching
+            any filter
+        """
+        self.filters = dict((key, frozenset(values)) for key, values in import_filters.items())
+        self.intersection = filter_option == constants.FILTER_OPTION_AND
+        # cheapest checks first
+        self.keys = [key for key in (constants.FILTER_TEST_CASE_KEY, constants.FILTER_TAG_KEY,
+                                     constants.FILTER_TEST_SUITE_KEY) if key in self.filters]
+        # given to the parser, that flags the tests inside these suites
+        self.suite_names = self.filters.get(constants.FILTER_TEST_SUITE_KEY, frozenset())
+        self.description = ', '.join('{}_{}'.format(key, '_'.join(values))
+                                     for key, values in sorted(import_filters.items()))
+
+    def __nonzero__(self):
+        return bool(self.keys)
+
+    def _match(self, key, test):
+        if key == constants.FILTER_TEST_CASE_KEY:
+            return test.name in self.filters[key]
+        if key == constants.FILTER_TAG_KEY:
+            return not self.filters[key].isdisjoint(test.tags)
+        return test.in_matched_suite
+
+    def match(self, test):
+        """
+        Check a test before its steps are parsed
+
+        :param test: Test read by the parser, with its name, tags and suite filter flag
+        :return: True if the test is imported
+        """
+        matches = (self._match(key, test) for key in self.keys)
+        return all(matches) if self.intersection else any(matches)
@@ -0,0 +1,151 @@
+"""
+    Checkpoint journal of the uploads.
+
+    Each step of the import of a test execution is appended to the journal once it is done: the test execution issue
+    created, each payload of results imported and the test execution linked to its test plan. When some test
+    executions fail to import, the run can be resumed with --resume: the steps already done are skipped and the
+    created test execution issues are reused, so no issue is created twice and only the remaining payloads are sent.
+
+    The journal belongs to one run, identified by the output files and the import options. A journal of another run
+    is not resumed. The journal is deleted once every test execution is imported.
+"""
+import json
+import os
+import threading
+from hashlib import sha1
+
+import constants
+
+
+def run_id(xml_files, options):
+    """
+    Identify a run by its output files, with their size and modification time, and its import options
+
+    :param xml_files: Robot Framework output XML files
+    :param options: Dict of the import options
+    :return: Hash of the run
+    """
+    digest = sha1()
+    for xml_file in xml_files:
+        stat = os.stat(xml_file)
+        digest.update(repr((os.path.abspath(xml_file), stat.st_size, stat.st_mtime)))
+    for option in sorted(options):
+        if option not in constants.JOURNAL_RUN_IGNORED_OPTIONS:
+            digest.update(repr((option, options[option])))
+    return digest.hexdigest()
+
+
+class UploadJournal(object):
+    """
+    Steps done by the imports of the test executions of a run, by test execution key
+    """
+
+    def __init__(self, path, run, resume=False):
+        """
+        :param path: Path to the journal file
+        :param run: Identity of the run, see run_id
+        :param resume: True to load the steps done by a previous attempt of the same run
+        """
+        self.path = path
+        self.run = run
+        # test execution key -> created issue key, (payload index -> import response) and test plan linked
+        self._created = {}
+        self._imported = {}
+        self._linked = set()
+        self._lock = threading.Lock()
+
+        self.resumed = resume and self._load()
+        self._file = open(path, 'a' if self.resumed else 'w')
+        if not self.resumed:
+            self._append({constants.JOURNAL_RUN: run})
+        elif not self._complete_line:
+            # the last entry was cut by a crash, the next ones start on a new line
+            self._file.write('\n')
+
+    def _load(self):
+        """
+        :return: True if the journal of the same run was loaded
+        """
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path) as journal:
+            lines = iter(journal)
+            try:
+                if json.loads(next(lines)).get(constants.JOURNAL_RUN) != self.run:
+                    return False
+            except (StopIteration, ValueError):
+                return False
+
+            line = ''
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # entry cut by a crash
+                    continue
+                key, step, value = entry[constants.JOURNAL_KEY], entry[constants.JOURNAL_STEP], \
+                    entry.get(constants.JOURNAL_VALUE)
+                if step == constants.JOURNAL_CREATED:
+                    self._created[key] = value
+                elif step == constants.JOURNAL_IMPORTED:
+                    self._imported.setdefault(key, {})[entry[constants.JOURNAL_PART]] = value
+                elif step == constants.JOURNAL_LINKED:
+                    self._linked.add(key)
+        self._complete_line = not line or line.endswith('\n')
+        return True
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _record(self, key, step, value=None, part=None):
+        entry = {constants.JOURNAL_KEY: key, constants.JOURNAL_STEP: step}
+        if value is not None:
+            entry[constants.JOURNAL_VALUE] = value
+        if part is not None:
+            entry[constants.JOURNAL_PART] = part
+        with self._lock:
+            self._append(entry)
+
+    def created_key(self, key):
+        """
+        :param key: Test execution key of the run
+        :return: Key of the test execution issue created for it, None if it was not created
+        """
+        return self._created.get(key)
+
+    def record_created(self, key, issue_key):
+        self._created[key] = issue_key
+        self._record(key, constants.JOURNAL_CREATED, issue_key)
+
+    def imported(self, key, part):
+        """
+        :param key: Test execution key of the run
+        :param part: Index of the payload in the test execution
+        :return: Response of the import of the payload, None if it was not imported
+        """
+        return self._imported.get(key, {}).get(part)
+
+    def record_imported(self, key, part, response):
+        self._imported.setdefault(key, {})[part] = response
+        self._record(key, constants.JOURNAL_IMPORTED, response, part)
+
+    def linked(self, key):
+        """
+        :param key: Test execution key of the run
+        :return: True if the test execution was linked to its test plan
+        """
+        return key in self._linked
+
+    def record_linked(self, key):
+        self._linked.add(key)
+        self._record(key, constants.JOURNAL_LINKED)
+
+    def close(self, completed=False):
+        """
+        :param completed: True if every test execution was imported, the journal is then deleted
+        """
+        self._file.close()
+        if completed:
+            os.remove(self.path)
@@ -0,0 +1,547 @@
+"""
+    Parsing of Robot Framework output files.
+
+    Two engines read the tests and suites of an output file, and return the same records:
+        - tree: lxml iterparse, each test is parsed into an element tree, read through adapters and deleted when
+          the next test or suite starts.
+        - target: an lxml parser target, the records are filled from the start, end and data callbacks of the
+          parser by a state machine, no element tree is built at all.
+
+    Most of an output file is made of keywords. When only the tags and status of the tests are needed, keyword
+    subtrees are cut out of the bytes read from the file, so the parser never materializes them. Robot Framework
+    escapes '<' in texts and attribute values, so keyword tags are found by a regular expression on the raw bytes.
+    In the same way, an output file can be split in the XML of its tests, to be parsed by other processes.
+
+    Whatever the engine, the open suites are kept in a SuitePath while streaming, so the suites of a test and
+    whether it is inside a suite of the suite filter are known in constant time, without walking its ancestors.
+"""
+import re
+
+import lxml.etree as ET
+
+import constants
+
+
+KEYWORD_TAG_REGEX = re.compile(constants.KEYWORD_TAG_REGEX)
+TEST_SUITE_TAG_REGEX = re.compile(constants.TEST_SUITE_TAG_REGEX)
+
+# XPath, compiled once. Tags are plain strings, that do not keep their element
+xpath_tag_text = ET.XPath(constants.XPATH_TAG_TEXT, smart_strings=False)
+
+
+class KeywordSkippingReader(object):
+    """
+    File-like reader of an output file without its keyword subtrees
+    """
+
+    def __init__(self, output, chunk_size=constants.PARSER_CHUNK_SIZE):
+        """
+        :param output: Output file opened in binary mode
+        :param chunk_size: Bytes read at a time from the file
+        """
+        self.output = output
+        self.chunk_size = chunk_size
+        # depth inside keyword subtrees
+        self._depth = 0
+        # unfinished tag at the end of the last chunk
+        self._pending = ''
+
+    def read(self, size=-1):
+        """
+        Read the next bytes out of keyword subtrees, an empty string only at the end of the file
+        """
+        while True:
+            chunk = self.output.read(self.chunk_size)
+            if not chunk:
+                data, self._pending = self._pending, ''
+                return data
+
+            data = self._pending + chunk
+            tag_start = data.rfind('<')
+            if tag_start != -1 and data.find('>', tag_start) == -1:
+                data, self._pending = data[:tag_start], data[tag_start:]
+            else:
+                self._pending = ''
+
+            kept = self._skip_keywords(data)
+            if kept:
+                return kept
+
+    def _skip_keywords(self, data):
+        kept = []
+        position = 0
+        for match in KEYWORD_TAG_REGEX.finditer(data):
+            closing, self_closing = match.group(1), match.group(2)
+            if closing:
+                self._depth -= 1
+                if not self._depth:
+                    position = match.end()
+            elif not self_closing:
+                if not self._depth:
+                    kept.append(data[position:match.start()])
+                self._depth += 1
+            elif not self._depth:
+                kept.append(data[position:match.start()])
+                position = match.end()
+        if not self._depth:
+            kept.append(data[position:])
+        return ''.join(kept)
+
+
+class SuitePath(object):
+    """
+    Stack of the open suites while streaming an output file. When a suite starts, the names of the suites from the
+    top suite and whether one of them is in the suite filter are computed once for its depth, and shared by all
+    its tests.
+    """
+
+    def __init__(self, suite_filter=()):
+        """
+        :param suite_filter: Names of the suites whose tests are imported, empty without suite filter
+        """
+        self.suite_filter = frozenset(suite_filter)
+        # (names of the open suites, True if one of them is in the suite filter), for each depth
+        self._stack = [((), False)]
+
+    @property
+    def suites(self):
+        return self._stack[-1][0]
+
+    @property
+    def in_matched_suite(self):
+        return self._stack[-1][1]
+
+    @property
+    def current(self):
+        return self._stack[-1]
+
+    def push(self, name):
+        suites, matched = self._stack[-1]
+        self._stack.append((suites + (name,), matched or name in self.suite_filter))
+
+    def pop(self):
+        """
+        :return: Name of the closed suite
+        """
+        return self._stack.pop()[0][-1]
+
+
+class KeywordRecord(object):
+    """
+    Keyword of a test, read by the target engine
+    """
+    __slots__ = ('name', 'type', 'status', 'args', 'messages', 'keywords')
+
+    def __init__(self, name, type=None):
+        self.name = name
+        self.type = type
+        # status of the first status child
+        self.status = None
+        # texts of the arguments
+        self.args = []
+        # (level, text) of the messages
+        self.messages = []
+        # for a test step, the step and all its lower keywords in document order, None otherwise
+        self.keywords = None
+
+
+class TestRecord(object):
+    """
+    Test read by the target engine
+    """
+    __slots__ = ('name', 'suites', 'in_matched_suite', 'tags', 'status', 'status_text', 'steps')
+
+    def __init__(self, name, suites, in_matched_suite=False):
+        self.name = name
+        # names of the suites of the test, from the top suite
+        self.suites = suites
+        # True if one of the suites of the test is in the suite filter
+        self.in_matched_suite = in_matched_suite
+        self.tags = []
+        # attributes of the status of the test, None if it has no status
+        self.status = None
+        self.status_text = None
+        # keywords of the test
+        self.steps = []
+
+
+class SuiteRecord(object):
+    """
+    Suite read by the target engine, once all its tests are read
+    """
+    __slots__ = ('name', 'suites')
+
+    def __init__(self, name, suites):
+        self.name = name
+        # names of the parent suites, from the top suite
+        self.suites = suites
+
+
+class ElementKeyword(object):
+    """
+    Keyword of a test, read from its XML element by the tree engine
+    """
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def name(self):
+        return self.element.attrib[constants.ATTRIB_NAME]
+
+    @property
+    def type(self):
+        return self.element.get(constants.ATTRIB_TYPE)
+
+    @property
+    def status(self):
+        status = self.element.find(constants.STATUS_TAG)
+        return status.attrib[constants.ATTRIB_STATUS] if status is not None else None
+
+    @property
+    def args(self):
+        return [arg.text for arg in self.element.findall(constants.XPATH_LOG_ARGS)]
+
+    @property
+    def messages(self):
+        return [(msg.get(constants.ATTRIB_LEVEL), msg.text) for msg in self.element.iterchildren(constants.MSG_TAG)]
+
+    @property
+    def keywords(self):
+        return (ElementKeyword(kw) for kw in self.element.iter(constants.KW_TAG))
+
+
+class ElementTest(object):
+    """
+    Test read from its XML element by the tree engine
+    """
+    __slots__ = ('element', 'suites', 'in_matched_suite')
+
+    def __init__(self, element, suites=(), in_matched_suite=False):
+        self.element = element
+        self.suites = suites
+        self.in_matched_suite = in_matched_suite
+
+    @property
+    def name(self):
+        return self.element.get(constants.ATTRIB_NAME)
+
+    @property
+    def tags(self):
+        return xpath_tag_text(self.element)
+
+    @property
+    def status(self):
+        status = self.element.find(constants.STATUS_TAG)
+        return status.attrib if status is not None else None
+
+    @property
+    def status_text(self):
+        status = self.element.find(constants.STATUS_TAG)
+        return status.text if status is not None else None
+
+    @property
+    def steps(self):
+        return (ElementKeyword(kw) for kw in self.element.iterchildren(constants.KW_TAG))
+
+
+class ElementSuite(object):
+    """
+    Suite read from its XML element by the tree engine, once all its tests are read
+    """
+    __slots__ = ('element', 'suites')
+
+    def __init__(self, element, suites):
+        self.element = element
+        self.suites = suites
+
+    @property
+    def name(self):
+        return self.element.get(constants.ATTRIB_NAME)
+
+
+class ResultTarget(object):
+    """
+    Parser target reading the tests and suites of an output file into records. The state is the stack of the
+    open tags, the open suites, the test being read, its open keywords and the text being collected.
+    """
+
+    def __init__(self, suite_filter=()):
+        """
+        :param suite_filter: Names of the suites whose tests are imported
+        """
+        # (tag, record) of the tests and suites read and not yet consumed
+        self.results = []
+        self._tags = []
+        self._suites = SuitePath(suite_filter)
+        self._test = None
+        self._keywords = []
+        self._step_keywords = None
+        # texts of the element whose text is collected, None if the text is not needed
+        self._text = None
+        self._level = None
+
+    def start(self, tag, attrib):
+        tags = self._tags
+        parent = tags[-1] if tags else None
+        tags.append(tag)
+
+        if tag == constants.KW_TAG:
+            keyword = KeywordRecord(attrib.get(constants.ATTRIB_NAME), attrib.get(constants.ATTRIB_TYPE))
+            if parent == constants.TEST_TAG and self._test is not None:
+                keyword.keywords = self._step_keywords = [keyword]
+                self._test.steps.append(keyword)
+            elif self._step_keywords is not None:
+                self._step_keywords.append(keyword)
+            self._keywords.append(keyword)
+
+        elif tag == constants.MSG_TAG:
+            if parent == constants.KW_TAG:
+                self._level = attrib.get(constants.ATTRIB_LEVEL)
+                self._text = []
+
+        elif tag == constants.STATUS_TAG:
+            if parent == constants.KW_TAG:
+                keyword = self._keywords[-1]
+                if keyword.status is None:
+                    keyword.status = attrib[constants.ATTRIB_STATUS]
+            elif parent == constants.TEST_TAG and self._test.status is None:
+                self._test.status = dict(attrib)
+                self._text = []
+
+        elif tag == constants.ARG_TAG:
+            if parent == constants.ARGUMENTS_TAG and tags[-3] == constants.KW_TAG:
+                self._text = []
+
+        elif tag == constants.TAG_TAG:
+            if parent == constants.TAGS_TAG and tags[-3] == constants.TEST_TAG:
+                self._text = []
+
+        elif tag == constants.TEST_TAG:
+            self._test = TestRecord(attrib.get(constants.ATTRIB_NAME), *self._suites.current)
+
+        elif tag == constants.SUITE_TAG:
+            self._suites.push(attrib.get(constants.ATTRIB_NAME))
+
+    def end(self, tag):
+        self._tags.pop()
+
+        if self._text is not None:
+            text = ''.join(self._text) if self._text else None
+            self._text = None
+            if tag == constants.MSG_TAG:
+                self._keywords[-1].messages.append((self._level, text))
+            elif tag == constants.ARG_TAG:
+                self._keywords[-1].args.append(text)
+            elif tag == constants.TAG_TAG:
+                # as the XPath of the tags text, empty tags are ignored
+                if text is not None:
+                    self._test.tags.append(text)
+            elif tag == constants.STATUS_TAG:
+                self._test.status_text = text
+
+        if tag == constants.KW_TAG:
+            keyword = self._keywords.pop()
+            if keyword.keywords is not None:
+                self._step_keywords = None
+
+        elif tag == constants.TEST_TAG:
+            self.results.append((constants.TEST_TAG, self._test))
+            self._test = None
+
+        elif tag == constants.SUITE_TAG:
+            name = self._suites.pop()
+            self.results.append((constants.SUITE_TAG, SuiteRecord(name, self._suites.suites)))
+
+    def data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def close(self):
+        return None
+
+
+def iter_test_fragments(xml_file, suite_filter=(), chunk_size=constants.PARSER_CHUNK_SIZE):
+    """
+    Split an output file in the XML of its tests, without parsing it. Tests and suites are found by a regular
+    expression on the raw bytes, as keywords are skipped, only the start tags of the suites are parsed for their
+    names.
+
+    :param xml_file: Robot Framework output XML file
+    :param suite_filter: Names of the suites whose tests are imported
+    :param chunk_size: Bytes read at a time from the file
+    :return: Iterator of (TEST_TAG, (names of the suites of the test, True if in a suite of the suite filter), XML
+        of the test) and (SUITE_TAG, None, SuiteRecord), in document order
+    """
+    suites = SuitePath(suite_filter)
+    # start of the test being read, None out of tests
+    test_start = None
+    # start of the bytes not scanned yet
+    scan_start = 0
+    data = ''
+    with open(xml_file, 'rb') as output:
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+
+            data += chunk
+            position = scan_start
+            for match in TEST_SUITE_TAG_REGEX.finditer(data, scan_start):
+                closing, tag, self_closing = match.groups()
+                if tag == constants.TEST_TAG:
+                    if closing:
+                        yield constants.TEST_TAG, suites.current, data[test_start:match.end()]
+                        test_start = None
+                    elif not self_closing:
+                        test_start = match.start()
+                elif test_start is None:
+                    if not closing:
+                        start_tag = match.group(0)[:-1].rstrip('/') + '/>'
+                        suites.push(ET.fromstring(start_tag).get(constants.ATTRIB_NAME))
+                    if closing or self_closing:
+                        name = suites.pop()
+                        yield constants.SUITE_TAG, None, SuiteRecord(name, suites.suites)
+                position = match.end()
+
+            # an unfinished tag at the end of the data is scanned again with the next chunk
+            scan_start = data.rfind('<', position)
+            if scan_start == -1 or data.find('>', scan_start) != -1:
+                scan_start = len(data)
+
+            # keep the test being read
+            kept = test_start if test_start is not None else scan_start
+            data = data[kept:]
+            scan_start -= kept
+            if test_start is not None:
+                test_start = 0
+
+
+def parse_test_fragment(fragment, engine=constants.PARSER_ENGINE_DEFAULT):
+    """
+    Parse the XML of a test split by iter_test_fragments
+
+    :param fragment: XML of the test
+    :param engine: Parser engine, "tree" or "target"
+    :return: Test, as read by the engine
+    """
+    if engine == constants.PARSER_ENGINE_TREE:
+        return ElementTest(ET.fromstring(fragment))
+
+    target = ResultTarget()
+    parser = ET.XMLParser(target=target)
+    parser.feed(fragment)
+    parser.close()
+    return target.results[0][1]
+
+
+def test_header(result, suites, in_matched_suite=False):
+    """
+    Record of a test without its keywords: its name, suites, tags and status
+
+    :param result: Test read by an engine
+    :param suites: Names of the suites of the test
+    :param in_matched_suite: True if one of the suites of the test is in the suite filter
+    :return: TestRecord
+    """
+    header = TestRecord(result.name, suites, in_matched_suite)
+    header.tags = list(result.tags)
+    status = result.status
+    header.status = dict(status) if status is not None else None
+    header.status_text = result.status_text
+    return header
+
+
+def _prune_previous_siblings(element):
+    """
+    Delete the elements parsed before an element in its parent. Called when a test or suite starts and ends, it
+    keeps in memory only the open suites, their last cleared child and the test being parsed, whatever the size of
+    the XML file: suite setups, documentation and finished tests or suites are deleted as soon as the next test or
+    suite starts. Each element is deleted once, so the pruning has a constant cost per element.
+
+    :param element: Test or suite XML element
+    """
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_tree_results(xml_file, headers_only=False, suite_filter=(), chunk_size=constants.PARSER_CHUNK_SIZE):
+    """
+    Stream the tests and suites of an output file with lxml iterparse. Each element is deleted once the consumer
+    asks for the next one.
+
+    :param xml_file: Robot Framework output XML file
+    :param headers_only: True to skip the keywords of the tests
+    :param suite_filter: Names of the suites whose tests are imported
+    :param chunk_size: Bytes read at a time from the file when the keywords are skipped
+    :return: Iterator of (tag, ElementTest or ElementSuite)
+    """
+    suites = SuitePath(suite_filter)
+    with open(xml_file, 'rb') as output:
+        source = KeywordSkippingReader(output, chunk_size) if headers_only else output
+        for event, element in ET.iterparse(source, events=constants.ITERPARSE_EVENTS,
+                                           tag=(constants.TEST_TAG, constants.SUITE_TAG)):
+            if event == constants.START_EVENT:
+                _prune_previous_siblings(element)
+                if element.tag == constants.SUITE_TAG:
+                    suites.push(element.get(constants.ATTRIB_NAME))
+                continue
+
+            if element.tag == constants.TEST_TAG:
+                yield constants.TEST_TAG, ElementTest(element, *suites.current)
+            else:
+                suites.pop()
+                yield constants.SUITE_TAG, ElementSuite(element, suites.suites)
+
+            element.clear()
+            _prune_previous_siblings(element)
+
+
+def iter_target_results(xml_file, headers_only=False, suite_filter=(), chunk_size=constants.PARSER_CHUNK_SIZE):
+    """
+    Stream the tests and suites of an output file with a parser target, without building any element
+
+    :param xml_file: Robot Framework output XML file
+    :param headers_only: True to skip the keywords of the tests
+    :param suite_filter: Names of the suites whose tests are imported
+    :param chunk_size: Bytes fed at a time to the parser
+    :return: Iterator of (tag, TestRecord or SuiteRecord)
+    """
+    target = ResultTarget(suite_filter)
+    parser = ET.XMLParser(target=target)
+    with open(xml_file, 'rb') as output:
+        source = KeywordSkippingReader(output, chunk_size) if headers_only else output
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            parser.feed(data)
+            for result in target.results:
+                yield result
+            del target.results[:]
+    parser.close()
+    for result in target.results:
+        yield result
+
+
+# engines, by name
+engines = {
+    constants.PARSER_ENGINE_TREE: iter_tree_results,
+    constants.PARSER_ENGINE_TARGET: iter_target_results,
+}
+
+
+def iter_results(xml_file, engine=constants.PARSER_ENGINE_DEFAULT, headers_only=False, suite_filter=()):
+    """
+    Stream the tests and suites of an output file, in document order. A suite is returned after its tests.
+
+    :param xml_file: Robot Framework output XML file
+    :param engine: Parser engine, "tree" or "target"
+    :param headers_only: True if only the name, tags and status of the tests are needed
+    :param suite_filter: Names of the suites whose tests are imported, to flag the tests inside them
+    :return: Iterator of (TEST_TAG, test) and (SUITE_TAG, suite)
+    """
+    return engines[engine](xml_file, headers_only, suite_filter)
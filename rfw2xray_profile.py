@@ -0,0 +1,265 @@
+"""
+    Instrumentation of the import, enabled with --profile.
+
+    The phases of the import are timed and its work is counted by the module-level profiler, shared by the modules of
+    the import. A phase records its number of calls, its total time and its longest call; an iteration timed with
+    timed_iter records only the time spent producing its items, not consuming them, as a single call. Phases nest:
+    e.g. the serialization includes the evidences read and encoded while it runs, and the HTTP requests include the
+    serialization of their streamed bodies. Parse workers send their phases and counters back with their results.
+
+    The report is written as JSON at exit, with the wall time and the peak RSS of the run. Optionally, cProfile runs
+    in the main thread and its hottest functions are added to the report, and tracemalloc, when the interpreter
+    provides it, traces the allocations of the run.
+
+    While the profiler is disabled, timers and counters do nothing.
+"""
+import atexit
+import json
+import threading
+import time
+
+import constants
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 3.4+, or the pytracemalloc backport
+    tracemalloc = None
+
+
+class _Timer(object):
+    __slots__ = ('profiler', 'phase', 'start')
+
+    def __init__(self, profiler, phase):
+        self.profiler = profiler
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.phase, time.time() - self.start)
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+_END = object()
+
+
+class Profiler(object):
+    """
+    Phases and counters of a run
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # phase -> [calls, seconds, longest call in seconds]
+        self.phases = {}
+        self.counters = {}
+        self.start_time = None
+        self._cpu = None
+        self._memory = False
+        self._lock = threading.Lock()
+
+    def reset(self, enabled=False):
+        """
+        Forget the phases and counters, e.g. those copied in a forked worker process
+
+        :param enabled: True to profile from now on
+        """
+        if self._cpu is not None:
+            self._cpu.disable()
+            self._cpu = None
+        with self._lock:
+            self.enabled = enabled
+            self.phases = {}
+            self.counters = {}
+
+    def timer(self, phase):
+        """
+        :param phase: Name of the phase
+        :return: Context manager timing a call of the phase
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, phase)
+
+    def add_time(self, phase, seconds, calls=1, longest=None):
+        with self._lock:
+            stats = self.phases.get(phase)
+            if stats is None:
+                stats = self.phases[phase] = [0, 0.0, 0.0]
+            stats[0] += calls
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds if longest is None else longest)
+
+    def count(self, counter, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def timed_iter(self, phase, iterable, counter=None):
+        """
+        Time the production of the items of an iterable
+
+        :param phase: Name of the phase
+        :param iterable: Iterable timed
+        :param counter: Name of the counter of the bytes of the items, None to not count them
+        :return: Iterator of the items
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(phase, iter(iterable), counter)
+
+    def _timed_iter(self, phase, iterator, counter):
+        seconds = 0.0
+        size = 0
+        try:
+            while True:
+                start = time.time()
+                item = next(iterator, _END)
+                seconds += time.time() - start
+                if item is _END:
+                    break
+                if counter is not None:
+                    size += len(item)
+                yield item
+        finally:
+            self.add_time(phase, seconds)
+            if counter is not None:
+                self.count(counter, size)
+
+    def collect(self):
+        """
+        Take the phases and counters recorded so far, e.g. to send them from a worker process to the main process
+
+        :return: (phases, counters), None if the profiler is disabled
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            collected = self.phases, self.counters
+            self.phases = {}
+            self.counters = {}
+        return collected
+
+    def merge(self, collected):
+        """
+        :param collected: Phases and counters returned by collect, in another process
+        """
+        if collected is None:
+            return
+        phases, counters = collected
+        for phase, (calls, seconds, longest) in phases.items():
+            self.add_time(phase, seconds, calls, longest)
+        for counter, value in counters.items():
+            self.count(counter, value)
+
+    def start(self, report_file, cpu=False, memory=False):
+        """
+        Enable the profiler, the report is written at exit
+
+        :param report_file: Path to the JSON report
+        :param cpu: True to run cProfile in the main thread
+        :param memory: True to trace the allocations with tracemalloc
+        """
+        self.reset(True)
+        self.start_time = time.time()
+        if memory:
+            if tracemalloc is None:
+                print constants.PROFILE_MEMORY_UNAVAILABLE_MSG
+            else:
+                tracemalloc.start()
+                self._memory = True
+        if cpu:
+            import cProfile
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+        atexit.register(self.write_report, report_file)
+
+    def report(self, cpu_file=None):
+        """
+        :param cpu_file: Path to dump the cProfile stats to, None to not dump them
+        :return: Dict with the wall time, peak RSS, phases, counters and, if enabled, the hottest functions and the
+            biggest allocations of the run
+        """
+        with self._lock:
+            phases = dict((phase, {'calls': calls, 'seconds': round(seconds, 6), 'longest': round(longest, 6)})
+                          for phase, (calls, seconds, longest) in self.phases.items())
+            counters = dict(self.counters)
+        report = {
+            'wall_seconds': round(time.time() - self.start_time, 6) if self.start_time else None,
+            'phases': phases,
+            'counters': counters,
+        }
+        if resource is not None:
+            # kilobytes on Linux
+            report['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['peak_rss_children'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+        if self._cpu is not None:
+            self._cpu.disable()
+            report['functions'] = _hot_functions(self._cpu, cpu_file)
+            self._cpu = None
+
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            report['memory'] = {
+                'traced_bytes': current,
+                'peak_traced_bytes': peak,
+                'allocations': [{'line': str(statistic.traceback), 'bytes': statistic.size,
+                                 'blocks': statistic.count}
+                                for statistic in snapshot.statistics('lineno')[:constants.PROFILE_TOP]],
+            }
+            tracemalloc.stop()
+            self._memory = False
+        return report
+
+    def write_report(self, report_file):
+        """
+        Write the JSON report, with the cProfile stats dumped next to it
+        """
+        report = self.report(report_file + constants.PROFILE_CPU_EXTENSION)
+        with open(report_file, 'w') as output:
+            json.dump(report, output, indent=2, separators=(',', ': '), sort_keys=True)
+        print constants.PROFILE_MSG.format(report_file)
+
+
+def _hot_functions(cpu, cpu_file=None):
+    """
+    :param cpu: cProfile.Profile, disabled
+    :param cpu_file: Path to dump the stats to, None to not dump them
+    :return: List of the functions with the highest own time, excluding the functions they call
+    """
+    import pstats
+    stats = pstats.Stats(cpu)
+    if cpu_file:
+        stats.dump_stats(cpu_file)
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [{'function': '{}:{}({})'.format(*function), 'calls': calls, 'seconds': round(total, 6),
+             'cumulative_seconds': round(cumulative, 6)}
+            for function, (_, calls, total, cumulative, _) in functions[:constants.PROFILE_TOP]]
+
+
+# profiler of the run
+profiler = Profiler()
+
+timer = profiler.timer
+count = profiler.count
+timed_iter = profiler.timed_iter
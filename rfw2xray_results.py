@@ -24,20 +24,29 @@
 
 """
 import argparse
+import glob
+import multiprocessing
 from argparse import RawTextHelpFormatter
 from urlparse import urljoin
-import requests
 import json
 import os
-import lxml.etree as ET
 import re
-import base64
 import time
 import sys
-from datetime import datetime
+import functools
+from collections import deque
 
 import rfw2xray_auth
+import rfw2xray_cache
+import rfw2xray_dates
+import rfw2xray_filters
+import rfw2xray_journal
+import rfw2xray_parser
+import rfw2xray_profile
+import rfw2xray_upload
 import testexec_builder as teb
+import testexec_evidences
+from testexec_model import TestExec, TestExecInfo, TestCase, TestStep, TestEvidence
 
 import constants
 #####################HEADER#######################
@@ -58,104 +67,135 @@ __status__ = "Development"
 evidence_KWs = ['Capture Page Screenshot']
 log_KWs = ['Log']
 
-def _log_step(step, kw_xml, kw_name):
+# evidences of the run, each evidence file is read and encoded once
+evidence_store = testexec_evidences.EvidenceStore()
+
+# conversion of Robot Framework timestamps to XRAY dates
+timestamps = rfw2xray_dates.TimestampConverter()
+
+def _log_keyword(kw, xml_file, comments, evidences):
     """
-    Check if is a log keyword, if true adds a comment to the respective test step
+    Collect the message of a log keyword if its level is WARN or ERROR
 
-    :param current_step: Current test step to save log
-    :param kw_xml: Current keyword XML element
-    :param kw_name: Current keyword name
-    :return:
-        Boolean value, True if current keyword is a log Keyword, False otherwise
-    """
-    if kw_name in log_KWs:  # in case step is a LOGGING step
-        log_args_text = [log_args.text for log_args in kw_xml.findall(constants.XPATH_LOG_ARGS)]
-        if len(log_args_text) >= 2:
-            log_text, log_level, _ = log_args_text
-            if log_level == constants.WARN or log_level == constants.ERROR:
-
-                # add log to step comment
-                #step.add_to_comment('{}:{}\n'.format(log_level, log_text))
-                
-                comment = teb.path_get(step,constants.STEP_COMMENT)
-                
-                comment = comment + '{}:{}\n'.format(log_level, log_text)
-                teb.path_set(step, constants.STEP_COMMENT, teb.path_get(step,constants.STEP_COMMENT) + 
-                                                        '{}:{}\n'.format(log_level, log_text))
-        
-        return True
-    else:
-        return False
+    :param kw: Log keyword
+    :param xml_file: XML file
+    :param comments: List where the step comments are collected
+    :param evidences: List where the step evidences are collected
+    """
+    log_args_text = kw.args
+    if len(log_args_text) >= 2:
+        log_text, log_level, _ = log_args_text
+        if log_level == constants.WARN or log_level == constants.ERROR:
+            comments.append('{}:{}\n'.format(log_level, log_text))
+
+
+def _evidence_keyword(kw, xml_file, comments, evidences):
+    """
+    Collect the evidence of an evidence keyword
+
+    :param kw: Evidence keyword
+    :param xml_file: XML file, evidences are located in its directory
+    :param comments: List where the step comments are collected
+    :param evidences: List where the step evidences are collected
+    """
+    # get msg from the evedence execution (it contains information regarding the evidence)
+    evidence_msg = next((text for level, text in kw.messages if level == constants.INFO), None)
 
+    # get the evidence source file from the evidence message in html
+    evidence_src_search = evidence_msg and re.search(constants.SRC_REGEX, evidence_msg, re.IGNORECASE)
 
-def _evidence_step(step, xml, kw_name, evidence_dir):
+    # if found
+    if evidence_src_search:
+        # get path to the evidence
+        evidence_src = os.path.join(os.path.dirname(xml_file), evidence_src_search.group(1))
+
+        # the evidence file is only read and encoded to base64 when the test execution is sent, once per run
+        evidences.append(TestEvidence(evidence_store.evidence(evidence_src), os.path.basename(evidence_src)))
+
+
+# special keywords handlers, by keyword name
+keyword_handlers = dict([(kw_name, _log_keyword) for kw_name in log_KWs] +
+                        [(kw_name, _evidence_keyword) for kw_name in evidence_KWs])
+
+
+def _add_to_step(step, comments, evidences):
+    for comment in comments:
+        step.add_to_comment(comment)
+    for evidence in evidences:
+        step.add_evidence(evidence)
+
+
+def _special_step(step, kw, kw_name, xml_file):
     """
-    Check if is a evidence keyword, if true adds a evidence to the respective test step
+    Check if is a log or evidence keyword, if true adds its comment or evidence to the respective test step
 
-    :param step: Current test step to save evidence
-    :param xml: Current keyword XML element
+    :param step: Test step to save log or evidence
+    :param kw: Current keyword
     :param kw_name: Current keyword name
-    :param evidence_dir: Directory where evidences are located
+    :param xml_file: XML file
     :return:
-        Boolean value, True if current keyword is a evidence Keyword, False otherwise
-    """
-    if kw_name in evidence_KWs:  # check if test step is in the evidence keywords (e.g. Capture Page Screenshot)
-
-        # get msg from the evedence execution (it contains information regarding the evidence)
-        evidence_msg = xml.find(constants.XPATH_EVIDENCE_MSG).text
-
-        # get the evidence source file from the evidence message in html
-        evidence_src_search = re.search(constants.SRC_REGEX, evidence_msg, re.IGNORECASE)
-
-        # if found
-        if evidence_src_search:
-            # get path to the evidence
-            evidence_src = os.path.join(os.path.dirname(evidence_dir), evidence_src_search.group(1))
-
-            # opens evidence file to encode to base64
-            with open(evidence_src, "rb") as evidence_file:
-                evidence_base64 = base64.b64encode(evidence_file.read())
-                #evidence_base64 = 'lol'
-
-            evidence = {}
-            teb.path_new(evidence, constants.EVIDENCE_DATA,evidence_base64)
-            teb.path_new(evidence, constants.EVIDENCE_FILENAME, os.path.basename(evidence_src))
-            
-            #print evidence
-            #print 'Dealing evidences:'
-            #print step
-            teb.path_get(step,constants.STEP_EVIDENCES).append(evidence)
-            
-            #print step
-            #step.add_evidence(TestEvidence(evidence_base64, os.path.basename(evidence_src)))
-
-        return True
-    else:
+        Boolean value, True if current keyword is a log or evidence Keyword, False otherwise
+    """
+    handler = keyword_handlers.get(kw_name)
+    if handler is None:
         return False
 
+    comments = []
+    evidences = []
+    handler(kw, xml_file, comments, evidences)
+    _add_to_step(step, comments, evidences)
+    return True
+
+
+def _visit_keywords(step_kw, xml_file, fail_messages, interleaved):
+    """
+    Traverse once all keywords of a test step, dispatching special keywords to their handler by name, and
+    collect its WARN/ERROR logs, its evidences and, if required, the FAIL messages of its failed keywords
+
+    :param step_kw: Keyword of the test step
+    :param xml_file: XML file
+    :param fail_messages: True to collect the FAIL messages of failed keywords
+    :param interleaved: True to keep logs and FAIL messages in keyword order, False to have all FAIL messages first
+    :return: List of comments; list of evidences
+    """
+    fail_comments = []
+    log_comments = fail_comments if interleaved else []
+    evidences = []
+
+    for kw in step_kw.keywords:
+        handler = keyword_handlers.get(kw.name)
+        if handler is not None:
+            handler(kw, xml_file, log_comments, evidences)
+
+        # check if level is failed is the positive case it corresponds to the error message
+        if fail_messages and kw.status == constants.FAIL:
+            fail_comments.extend('{}:{}\n'.format(constants.FAIL, text)
+                                 for level, text in kw.messages if level == constants.FAIL)
 
-def get_log_and_evidences_from_teststep(step_xml, teststep, xml_file):
+    if not interleaved:
+        fail_comments.extend(log_comments)
+    return fail_comments, evidences
+
+
+def get_log_and_evidences_from_teststep(step_kw, teststep, xml_file):
     """
     Examine a test step to get logs or evidences and add them to test step
 
-    :param step_xml: XML element of current step
+    :param step_kw: Keyword of current step
     :param teststep: Test step class of current step
     :param xml_file: XML file
 
     """
-    for kw_xml in step_xml.iter(constants.KW_TAG):
-        # verify if is a log keyword and if positive logs the current test step
-        _log_step(teststep, kw_xml, kw_xml.attrib[constants.ATTRIB_NAME])
-        # verify if is a evidence keyword and if positive, saves evidence in the current test step
-        _evidence_step(teststep, kw_xml, kw_xml.attrib[constants.ATTRIB_NAME], xml_file)
+    comments, evidences = _visit_keywords(step_kw, xml_file, False, False)
+    _add_to_step(teststep, comments, evidences)
 
 
-def _parse_test_steps(xml_file, test_xml, test, test_steps_filter, evidences_import):
+def _parse_test_steps(xml_file, test_result, test, test_steps_filter, evidences_import):
     """
-    Parse a test xml element and add steps to test case class
+    Parse the keywords of a test and add steps to test case class
 
     :param xml_file: XML file
-    :param test_xml: Current test xml element
+    :param test_result: Current test, as read by the parser
     :param test: Current test class
     :param test_steps_filter: Test steps filtering
     :param evidences_import: Evidences selection
@@ -166,29 +206,20 @@ def _parse_test_steps(xml_file, test_xml, test, test_steps_filter, evidences_imp
 
         previous_step = None
 
-        # parse XML test case steps
-        for step_xml in test_xml.findall(constants.KW_TAG):
+        # parse test case steps
+        for step_kw in test_result.steps:
 
-            if constants.ATTRIB_TYPE in step_xml.attrib and step_xml.attrib[constants.ATTRIB_TYPE] == constants.SETUP:
+            kw_type = step_kw.type
+            if kw_type == constants.SETUP:
                 continue
 
             # get test step name
-            teststep_name = step_xml.attrib[constants.ATTRIB_NAME].replace("{", "\{").replace("}", "\}")
+            teststep_name = step_kw.name.replace("{", "\{").replace("}", "\}")
 
             # get test step status
-            teststep_status = step_xml.find(constants.STATUS_TAG).attrib[constants.ATTRIB_STATUS]
+            teststep_status = step_kw.status
         
-            #teststep = TestStep(teststep_status)
-
-            teststep = {}
-
-            #   Init test step values
-            teb.path_new(teststep, constants.STEP_STATUS, teststep_status)
-            teb.path_new(teststep, constants.STEP_COMMENT, '')
-            teb.path_new(teststep, constants.STEP_EVIDENCES, [])
-            
-            #print ' CURRENT STEP :'
-            #print teststep
+            teststep = TestStep(teststep_status)
 
             if evidences_import == constants.EVIDENCES_SELECTION_NONE:  # if importor of evidences is None continue to next test step
                 continue
@@ -196,160 +227,87 @@ def _parse_test_steps(xml_file, test_xml, test, test_steps_filter, evidences_imp
             elif evidences_import == constants.EVIDENCES_SELECTION_FAIL:
                 #   check for special keywords given the previous test step status. Search for log/evidence keywords and
                 #   teardown
-                if previous_step and teb.path_get(previous_step, 'step_status') == constants.FAIL:
-                    if _log_step(previous_step, step_xml, teststep_name) or \
-                            _evidence_step(previous_step, step_xml, teststep_name, xml_file):
+                if previous_step and previous_step.status == constants.FAIL:
+                    if _special_step(previous_step, step_kw, teststep_name, xml_file):
                         continue
 
-                    if constants.ATTRIB_TYPE in step_xml.attrib:
-                        kw_type = step_xml.attrib[constants.ATTRIB_TYPE]
-
-                        #   if a test step has failed, check if the next kw is teardown. If true, treat it as a high keyword
-                        if kw_type == constants.TEARDOWN:
-                            # for each keyword of the test step
-                            get_log_and_evidences_from_teststep(step_xml,teststep, xml_file)
-                            continue
-                        else:
-                            continue
+                    #   a keyword with a type after a failed step (e.g. teardown) is not imported as a test step
+                    if kw_type is not None:
+                        continue
 
                 if teststep_status == constants.FAIL:   # check if the current teststep status is Fail
-
-                    # get the ERROR message from lower KW
-                    # go deep to all keywords of the test step
-                    for kw in step_xml.iter(constants.KW_TAG):
-
-                        # extract evidences given that evidences filter is Fail
-                        # verify if is a log keyword and if positive logs the current test step
-                        _log_step(teststep, kw, kw.attrib[constants.ATTRIB_NAME])
-
-                        # verify if is a evidence keyword and if positive, saves evidence in the current test step
-                        _evidence_step(teststep, kw, kw.attrib[constants.ATTRIB_NAME], xml_file)
-
-                        # check if the keyword has failed
-                        if kw.find(constants.STATUS_TAG).attrib[constants.ATTRIB_STATUS] == constants.FAIL:
-                            # get message tags
-                            for msg in kw.findall(constants.MSG_TAG):
-                                # check if level is failed is the positive case it corresponds to the error message
-                                if msg.attrib[constants.ATTRIB_LEVEL] == constants.FAIL:
-                                    #teststep.add_to_comment('{}:{}\n'.format(msg.attrib[constants.ATTRIB_LEVEL], msg.text))
-                                    teb.path_set(teststep, constants.STEP_COMMENT, teb.path_get(teststep,constants.STEP_COMMENT) + 
-                                                        '{}:{}\n'.format(msg.attrib[constants.ATTRIB_LEVEL], msg.text))
+                    # go deep to all keywords of the test step, once, for the error messages, logs and evidences
+                    comments, evidences = _visit_keywords(step_kw, xml_file, True, True)
+                    _add_to_step(teststep, comments, evidences)
             else:
                 #check current keyword if it is a log/evidence kw add it to the last test step
-                if _log_step(previous_step, step_xml, teststep_name) or _evidence_step(previous_step, step_xml, teststep_name, xml_file):
+                if _special_step(previous_step, step_kw, teststep_name, xml_file):
+                    continue
+
+                #   a keyword with a type after a failed step (e.g. teardown) is not imported as a test step
+                if previous_step and previous_step.status == constants.FAIL and kw_type is not None:
                     continue
 
-                if previous_step and teb.path_get(previous_step, constants.STEP_STATUS) == constants.FAIL:
-                    if constants.ATTRIB_TYPE in step_xml.attrib:
-                        kw_type = step_xml.attrib[constants.ATTRIB_TYPE]
-
-                        # if a test step has failed, check if the next kw is teardown. If true, treat it as a high keyword
-                        if kw_type == constants.TEARDOWN:
-
-                            # for each keyword of the test step
-                            get_log_and_evidences_from_teststep(step_xml, teststep, xml_file)
-
-                            continue
-                        else:
-                            continue
-
-                #in case of failure get the message from lowe kw
-                if teststep_status == constants.FAIL:
-                    # go deep to all keywords of the test step
-                    for kw in step_xml.iter(constants.KW_TAG):
-                        # check if the keyword has failed
-                        if kw.find(constants.STATUS_TAG).attrib[constants.ATTRIB_STATUS] == constants.FAIL:
-                            # get message tags
-                            for msg in kw.findall(constants.MSG_TAG):
-                                # check if level is failed is the positive case it corresponds to the error message
-                                if msg.attrib[constants.ATTRIB_LEVEL] == constants.FAIL:
-                                    #teststep.add_to_comment('{}:{}\n'.format(msg.attrib[constants.ATTRIB_LEVEL], msg.text))
-                                    teb.path_set(teststep, constants.STEP_COMMENT, teb.path_get(teststep,constants.STEP_COMMENT) + 
-                                                        '{}:{}\n'.format(msg.attrib[constants.ATTRIB_LEVEL], msg.text))
-                                    
-                # for each keyword of the test step
-                get_log_and_evidences_from_teststep(step_xml,teststep, xml_file)
+                # go deep to all keywords of the test step, once, for the logs, evidences and, in case of failure,
+                # the error messages of the lower keywords
+                comments, evidences = _visit_keywords(step_kw, xml_file, teststep_status == constants.FAIL, False)
+                _add_to_step(teststep, comments, evidences)
 
             previous_step = teststep
 
             if test_steps_filter:
-                teb.path_get(test, constants.STEPS).append(teststep)
-                #test.add_step(teststep)
+                test.add_step(teststep)
             else:
-                teststep_evidences = teb.path_get(teststep, constants.TEST_EVIDENCES)
-                test_evidences = teb.path_get(test, constants.TEST_EVIDENCES)
+                test.add_evidences(teststep.evidences)
 
-                test_evidences = test_evidences + teststep_evidences 
-                
-                teb.path_set(test, constants.TEST_EVIDENCES, test_evidences)
-               # if teststep.comment:
-               #     test.comment += teststep.comment
+        # steps receive comments until the end of the test, e.g. from the keywords after a failed step
+        for teststep in test.steps:
+            teststep.finalize()
 
     return test
 
 
-def _create_test_case(test_xml, test_key):
+def _create_test_case(test_result, test_key):
     """
-    Create a test case class given the xml and the JIRA ISSUE
-    :param test_xml: Current test XML element
+    Create a test case class given the test and the JIRA ISSUE
+    :param test_result: Current test, as read by the parser
     :param test_key: Test key of the test to create
     :return: A test case class
     """
     # get test status
-    test_status_elem = test_xml.find(constants.STATUS_TAG)
-    test_status_value = test_status_elem.attrib[constants.ATTRIB_STATUS]
-    test_status_text = test_xml.find(constants.STATUS_TAG).text
+    test_status_attrib = test_result.status
+    test_status_value = test_status_attrib[constants.ATTRIB_STATUS]
+    test_status_text = test_result.status_text
 
     # get stat date time
-    test_start_date = datetime.strptime(test_status_elem.attrib[constants.ATTRIB_STARTTIME],
-                                        constants.DATE_ROBOT_FRAMEWORK_FORMAT).strftime(constants.DATE_XRAY_FORMAT)
+    test_start_date = timestamps.convert(test_status_attrib[constants.ATTRIB_STARTTIME])
     # get end date time
-    test_finish_date = datetime.strptime(test_status_elem.attrib[constants.ATTRIB_ENDTIME],
-                                         constants.DATE_ROBOT_FRAMEWORK_FORMAT).strftime(constants.DATE_XRAY_FORMAT)
+    test_finish_date = timestamps.convert(test_status_attrib[constants.ATTRIB_ENDTIME])
 
-    test = {}
-
-    teb.path_new(test,constants.TEST_TESTKEY, test_key)
-    teb.path_new(test,constants.TEST_STATUS, test_status_value)
-    teb.path_new(test,constants.TEST_START, test_start_date)
-    teb.path_new(test,constants.TEST_FINISH, test_finish_date)
-    teb.path_new(test,constants.STEPS, [])
-    if test_status_text:
-        teb.path_new(test,constants.TEST_COMMENT, test_status_text)
-    
-    #print test
-    '''
-    # create a new TestClass object
+    # create a new TestCase record
     test = TestCase(test_key, test_status_value)
     test.start = test_start_date
     test.finish = test_finish_date
     if test_status_text:
         test.comment = test_status_text
-    '''
+
     return test, test_key
 
 
-def _parse_test(element, tag_filter, filter_tests, test_steps_filter, evidences_import, xml_file, debug_mode):
+def _parse_test(test_result, test_steps_filter, evidences_import, xml_file, debug_mode):
     """
-    Parse a test case XML element and create a Test Case class with its steps
-    :param element: Current test XML element
-    :param tag_filter: Filtering of tags
-    :param filter_tests: Dict to add the filtered tests
+    Parse a test case and create a Test Case class with its steps
+    :param test_result: Current test, as read by the parser
     :param test_steps_filter: Filtering of test steps
     :param evidences_import: Evidences selection
     :param xml_file: XML file
-    :return: A test case class with all its steps; a JIRA test execution key if found
+    :return: A test case class with all its steps; its JIRA test key; a JIRA test execution key if found
     """
-    tag_found = ''
     testexec_key = constants.NO_TESTEXEC_KEY
     test_key = ''
-    tags_text = element.xpath(constants.XPATH_TAG_TEXT)
+    tags_text = test_result.tags
 
     for tag_text in tags_text:
-
-        if tag_filter:
-            if tag_text in import_filters[constants.FILTER_TAG_KEY]:
-                tag_found = tag_text
         try:
             jira_issue_type , jira_issue_number = tag_text.split(constants.TEST_TAG_SEPARATOR)
             # verify if tag has the label JIRA_TEST
@@ -363,294 +321,525 @@ def _parse_test(element, tag_filter, filter_tests, test_steps_filter, evidences_
             if debug_mode:
                 print "TAG: " + tag_text + " Skipped"
 
-    test_case, test_key = _create_test_case(element, test_key)
-    test_case = _parse_test_steps(xml_file, element, test_case, test_steps_filter,
-                                  evidences_import)  # create a test case object and adds steps to it
+    test_case, test_key = _create_test_case(test_result, test_key)
+    with rfw2xray_profile.timer('steps'):
+        test_case = _parse_test_steps(xml_file, test_result, test_case, test_steps_filter,
+                                      evidences_import)  # create a test case object and adds steps to it
 
-    if tag_filter:
-        if tag_found:
-            filter_tests[constants.FILTER_TAG_KEY].append(test_case)
+    if rfw2xray_profile.profiler.enabled:
+        rfw2xray_profile.count('tests')
+        rfw2xray_profile.count('steps', len(test_case.steps))
+        rfw2xray_profile.count('evidences', sum(1 for _ in rfw2xray_cache.iter_evidences(test_case)))
 
     return test_case, test_key, testexec_key
 
 
-def _get_test_date(element, date_attrib):
-    status = element.find(constants.STATUS_TAG)
+def _filter_and_parse_test(test_result, test_filter, test_steps_filter, evidences_import, xml_file, debug_mode):
+    """
+    Parse a test if it passes the filters, checked before its steps and evidences are parsed
+
+    :param test_result: Current test, as read by the parser
+    :param test_filter: TestFilter, None to import every test
+    :return: A test case class with all its steps; its JIRA test key; a JIRA test execution key if found. None if
+        the test is rejected by the filters
+    """
+    if test_filter and not test_filter.match(test_result):
+        rfw2xray_profile.count('tests_filtered_out')
+        return None
+    return _parse_test(test_result, test_steps_filter, evidences_import, xml_file, debug_mode)
+
+
+def _get_test_date(test_result, date_attrib):
+    status = test_result.status
     if status is not None:
-        if status.attrib[constants.ATTRIB_ENDTIME] != constants.NO_VALUE:
+        if status[constants.ATTRIB_ENDTIME] != constants.NO_VALUE:
             # get end date time
-            return datetime.strptime(status.attrib[date_attrib],
-                                                  constants.DATE_ROBOT_FRAMEWORK_FORMAT).strftime(
-                constants.DATE_XRAY_FORMAT)
+            return timestamps.convert(status[date_attrib])
 
 
-def filtering_import(xml_file, test_steps_filter, evidences_import, import_filters, filter_option, debug_mode, **kwargs):
+def _iter_results(xml_file, test_steps_filter, evidences_import, parser_engine, suite_filter=()):
     """
-    Imports with filtering and return a test execution
+    Stream the tests and suites of the XML file. Without steps nor evidences only the tags and status of the tests
+    are needed, so their keywords are skipped instead of parsed.
+
     :param xml_file: Robot Framework output XML file
     :param test_steps_filter: Filtering of test steps
-    :param evidences_import: Evidences Selection
-    :param import_filters: Importation filters
-    :param filter_option: Filter option, either intersaction or union
-    :return: Test execution with the filters applied
+    :param evidences_import: Evidences selection
+    :param parser_engine: Parser engine, "tree" or "target"
+    :param suite_filter: Names of the suites whose tests are imported
+    :return: Iterator of (tag, test or suite)
+    """
+    headers_only = not test_steps_filter and evidences_import == constants.EVIDENCES_SELECTION_NONE
+    return rfw2xray_parser.iter_results(xml_file, parser_engine, headers_only, suite_filter)
+
+
+def _parse_test_batch(batch):
     """
-    filters_tests = {}
+    Parse a batch of tests, in a parse worker process
 
-    test_suite_filter = False
-    test_case_filter = False
-    tag_filter = False
+    :param batch: (xml_file, test_filter, test_steps_filter, evidences_import, debug_mode, parser_engine) and the
+        list of (TEST_TAG, suite path of the test, XML of the test) and (SUITE_TAG, None, suite record)
+    :return: List of (tag, test header or suite record, parsed test or None), and the phases and counters of the
+        profiler
+    """
+    (xml_file, test_filter, test_steps_filter, evidences_import, debug_mode, parser_engine), jobs = batch
+    parsed = []
+    for tag, suite_path, fragment in jobs:
+        if tag == constants.TEST_TAG:
+            result = rfw2xray_parser.parse_test_fragment(fragment, parser_engine)
+            header = rfw2xray_parser.test_header(result, *suite_path)
+            if test_filter and not test_filter.match(header):
+                rfw2xray_profile.count('tests_filtered_out')
+                parsed.append((tag, header, None))
+                continue
+            parsed.append((tag, header, _parse_test(result, test_steps_filter, evidences_import, xml_file,
+                                                    debug_mode)))
+        else:
+            parsed.append((tag, fragment, None))
+    return parsed, rfw2xray_profile.profiler.collect()
+
+
+def _iter_parsed(xml_file, test_filter, test_steps_filter, evidences_import, debug_mode, parser_engine,
+                 test_workers=1):
+    """
+    Stream the tests and suites of the XML file, with each test parsed. With several test workers, the main
+    process only splits the file in the XML of its tests, without parsing it. The tests are parsed by a pool of
+    processes, with their steps and evidences, and returned in document order. A bounded number of batches is in
+    the pool, so the memory does not depend on the size of the file. Without steps nor evidences, there is
+    nothing to parse in parallel and the tests are parsed in this process.
 
-    if constants.FILTER_TEST_SUITE_KEY in import_filters:
-        test_suite_filter = True
-        filters_tests[constants.FILTER_TEST_SUITE_KEY] = []
+    Tests rejected by the filters are returned without being parsed.
 
-    if constants.FILTER_TEST_CASE_KEY in import_filters:
-        test_case_filter = True
-        filters_tests[constants.FILTER_TEST_CASE_KEY] = []
+    :param xml_file: Robot Framework output XML file
+    :param test_filter: TestFilter, None to import every test
+    :param test_steps_filter: Filtering of test steps
+    :param evidences_import: Evidences selection
+    :param parser_engine: Parser engine, "tree" or "target"
+    :param test_workers: Number of processes parsing the tests, 1 to parse them in this process
+    :return: Iterator of (TEST_TAG, test, (test case, test key, test execution key) or None if the test is
+        rejected) and (SUITE_TAG, suite, None)
+    """
+    suite_filter = test_filter.suite_names if test_filter else ()
+    headers_only = not test_steps_filter and evidences_import == constants.EVIDENCES_SELECTION_NONE
+    if test_workers <= 1 or headers_only:
+        for tag, result in rfw2xray_profile.timed_iter('parse', _iter_results(
+                xml_file, test_steps_filter, evidences_import, parser_engine, suite_filter)):
+            parsed = None
+            if tag == constants.TEST_TAG:
+                parsed = _filter_and_parse_test(result, test_filter, test_steps_filter, evidences_import, xml_file,
+                                                debug_mode)
+            yield tag, result, parsed
+        return
+
+    options = (xml_file, test_filter, test_steps_filter, evidences_import, debug_mode, parser_engine)
+    # no thread prefetching evidences is forked with the workers
+    evidence_store.wait_prefetch()
+    pool = multiprocessing.Pool(test_workers, _init_import_worker, (timestamps.offset, TestStep.max_comment_bytes,
+                                                                    rfw2xray_profile.profiler.enabled))
+    pending = deque()
+    try:
+        jobs = []
+        for job in rfw2xray_profile.timed_iter('split_tests', rfw2xray_parser.iter_test_fragments(xml_file,
+                                                                                                  suite_filter)):
+            jobs.append(job)
+            if len(jobs) >= constants.TEST_BATCH_SIZE:
+                pending.append(pool.apply_async(_parse_test_batch, ((options, jobs),)))
+                jobs = []
+                if len(pending) >= test_workers * constants.TEST_BATCHES_PER_WORKER:
+                    for parsed in _adopt_batch(pending.popleft().get()):
+                        yield parsed
+        if jobs:
+            pending.append(pool.apply_async(_parse_test_batch, ((options, jobs),)))
+        while pending:
+            for parsed in _adopt_batch(pending.popleft().get()):
+                yield parsed
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _adopt_batch(batch):
+    """
+    Register in the evidence store of the run the evidences of a batch of tests parsed by a worker, and its phases
+    and counters in the profiler of the run
+    """
+    batch, collected = batch
+    rfw2xray_profile.profiler.merge(collected)
+    for tag, _, parsed in batch:
+        if parsed is not None:
+            _adopt_test_evidences(parsed[0])
+    return batch
 
-    if constants.FILTER_TAG_KEY in import_filters:
-        tag_filter = True
-        filters_tests[constants.FILTER_TAG_KEY] = []
 
+def filtering_import(xml_file, test_steps_filter, evidences_import, import_filters, filter_option, debug_mode,
+                     parser_engine=constants.PARSER_ENGINE_DEFAULT, test_workers=1, **kwargs):
+    """
+    Imports with filtering and return a test execution
+    :param xml_file: Robot Framework output XML file
+    :param test_steps_filter: Filtering of test steps
+    :param evidences_import: Evidences Selection
+    :param import_filters: Importation filters
+    :param filter_option: Filter option, either intersaction or union
+    :param parser_engine: Parser engine, "tree" or "target"
+    :param test_workers: Number of processes parsing the tests, 1 to parse them in this process
+    :return: Test execution with the filters applied
+    """
+    test_filter = rfw2xray_filters.TestFilter(import_filters, filter_option)
 
     tests = []
     test_execs = {}
     test_testexec_key = {}
     name = ''
 
-    for _, element in ET.iterparse(xml_file, tag=(constants.TEST_TAG, constants.SUITE_TAG)):
-
-        if element.tag == constants.TEST_TAG:
-            test_case, test_key, testexec_key = _parse_test(element, tag_filter, filters_tests, test_steps_filter,
-                                                  evidences_import, xml_file,debug_mode)
-
+    for tag, result, parsed in _iter_parsed(xml_file, test_filter, test_steps_filter, evidences_import, debug_mode,
+                                            parser_engine, test_workers):
+        if tag == constants.TEST_TAG and parsed is not None:
+            test_case, test_key, testexec_key = parsed
             test_testexec_key[test_key] = testexec_key
-
-            if test_case_filter:
-                if element.attrib[constants.ATTRIB_NAME] in import_filters[constants.FILTER_TEST_CASE_KEY]:
-                    filters_tests[constants.FILTER_TEST_CASE_KEY].append(test_case)
             tests.append(test_case)
 
-        if element.tag == constants.SUITE_TAG and constants.ATTRIB_NAME in element.attrib:
-            if test_suite_filter:
-                for ancestor in element.xpath(constants.XPATH_ANCESTOR):
-                    if constants.ATTRIB_NAME in ancestor.attrib:
-                        if ancestor.attrib[constants.ATTRIB_NAME] in import_filters[constants.FILTER_TEST_SUITE_KEY]:
-                            filters_tests[constants.FILTER_TEST_SUITE_KEY] += tests
-
-            tests = []
-
-        # get test execution name
-        if not name:
-            for ancestor in element.xpath(constants.XPATH_ANCESTOR_SUITE):
-                name = ancestor.attrib[constants.ATTRIB_NAME]
-                break
-
-        element.clear()
-        for ancestor in element.xpath(constants.XPATH_ANCESTOR):
-            while ancestor.getprevious() is not None:
-                del ancestor.getparent()[0]
-
-    if test_suite_filter or test_case_filter or tag_filter:
-        filter_key_value = []
-        tests = []
-        for key, value in import_filters.items():
-            value_filters = '_'.join(value)
-            filter_key_value.append('{}_{}'.format(key, value_filters))
-            tests.append(set(filters_tests[key]))
-
-        if filter_option == constants.FILTER_OPTION_AND:
-            result = reduce(set.intersection, tests)
-        else:
-            result = reduce(set.union,tests)
+        # get test execution name, the top suite of the suite path
+        if not name and result.suites:
+            name = result.suites[0]
 
-        result = sorted(list(result), key=lambda test: test.testKey)
+    for test in sorted(tests, key=lambda test: test.testKey):
+        testexec_key = test_testexec_key[test.testKey]
+        if testexec_key in test_execs:
+            test_execs[testexec_key].tests.append(test)
+        else:
+            test_exec = TestExec([test])
 
-        for test in result:
-            testexec_key = test_testexec_key[teb.path_get(test, constants.TEST_TESTKEY)]
-            if testexec_key in test_execs:
-                test_execs[testexec_key].tests.append(test)
+            if testexec_key != constants.NO_TESTEXEC_KEY:
+                test_exec.testExecutionKey = testexec_key
             else:
-                test_exec = {}
-                teb.path_new(test_exec, constants.TESTS, [tests])
-                
-                #test_exec = TestExec([test])
-                
-                if testexec_key != constants.NO_TESTEXEC_KEY:
-                    #test_exec.testExecutionKey = testexec_key
-                    teb.path_new(test_exec,constants.TESTEXECUTIONKEY, testexec_key)
-                else:
+                test_exec.info = TestExecInfo(**kwargs)
 
+                if test_exec.info.summary is None :
+                    test_exec.info.summary = constants.TEST_EXECUTION_SUMMARY_FILTERS.format(
+                        name + ' ' + str(time.time()), test_filter.description)
 
-                    for key in kwargs:
-                        teb.path_new(test_exec, key, kwargs[key])
-
-                    if teb.path_get(test_exec, constants.SUMMARY) is None :
-                        teb.path_new(test_exec,constants.SUMMARY, constants.TEST_EXECUTION_SUMMARY_FILTERS.format(name + ' ' + str(time.time())))
-                   
-                    #test_exec.info = test_exec_info
-
-                test_execs[testexec_key] = test_exec
+            test_execs[testexec_key] = test_exec
     return test_execs
 
 
-def no_filtering_import(xml_file, test_steps_filter, evidences_import, debug_mode, **kwargs):
+def no_filtering_import(xml_file, test_steps_filter, evidences_import, debug_mode,
+                        parser_engine=constants.PARSER_ENGINE_DEFAULT, test_workers=1, **kwargs):
     """
     Import XML file with no filtering
     :param xml_file: Robot Framework XML output file
     :param test_steps_filter: Filtering of test steps
     :param evidences_import: Evidences selection
+    :param parser_engine: Parser engine, "tree" or "target"
+    :param test_workers: Number of processes parsing the tests, 1 to parse them in this process
     :return: Test executions to import
     """
     test_execs = {}
-    for _, element in ET.iterparse(xml_file, tag=(constants.TEST_TAG, constants.SUITE_TAG)):
-
-        if element.tag == constants.TEST_TAG:
-            test_case, _, testexec_key = _parse_test(element, False, {},
-                                                  test_steps_filter, evidences_import, xml_file, debug_mode)
+    for tag, result, parsed in _iter_parsed(xml_file, None, test_steps_filter, evidences_import, debug_mode,
+                                            parser_engine, test_workers):
+        if tag == constants.TEST_TAG:
+            test_case, _, testexec_key = parsed
             #print test_execs
             #print testexec_key
             if testexec_key in test_execs:
-                #print test_execs[testexec_key]
-                test_execs[testexec_key]['tests'].append(test_case)
+                test_execs[testexec_key].tests.append(test_case)
             else:
-                #   print test
-                test_exec = {}
-                teb.path_new(test_exec, constants.TESTS, [test_case])
-
+                test_exec = TestExec([test_case])
 
                 if testexec_key != constants.NO_TESTEXEC_KEY:
-                    test_exec['testExecutionKey'] = testexec_key
+                    test_exec.testExecutionKey = testexec_key
 
-                #test_exec_info = TestExecInfo(**kwargs)
-                #print kwargs
-                for key in kwargs:
-                    teb.path_new(test_exec, key, kwargs[key])
+                test_exec_info = TestExecInfo(**kwargs)
         
                 # If does not have startDate 
-                if teb.path_get(test_exec, constants.TEST_EXECUTION_INFO_STARTDATE_KEY) is None:
-                    teb.path_new(test_exec,constants.TEST_EXECUTION_INFO_STARTDATE_KEY, _get_test_date(element, constants.ATTRIB_STARTTIME))
+                if test_exec_info.startDate is None:
+                    test_exec_info.startDate = _get_test_date(result, constants.ATTRIB_STARTTIME)
         
                 # If does not have finishDate
-                if teb.path_get(test_exec, constants.TEST_EXECUTION_INFO_FINISHDATE_KEY) is None:
-                    teb.path_new(test_exec,constants.TEST_EXECUTION_INFO_FINISHDATE_KEY, _get_test_date(element, constants.ATTRIB_STARTTIME))
-                #if not hasattr(test_exec_info, constants.TEST_EXECUTION_INFO_STARTDATE_KEY):
-                #    test_exec_info.startDate = _get_test_date(element, constants.ATTRIB_STARTTIME)
-        
-                #if not hasattr(test_exec_info, constants.TEST_EXECUTION_INFO_FINISHDATE_KEY):
-                #    test_exec_info.finishDate = _get_test_date(element, constants.ATTRIB_ENDTIME)
-
-                name = ''
-                for ancestor in element.xpath(constants.XPATH_ANCESTOR_SUITE):
-                    name = ancestor.attrib[constants.ATTRIB_NAME]
-                    break
-                
-                if teb.path_get(test_exec, constants.SUMMARY) is None :
-                    teb.path_new(test_exec,constants.SUMMARY, constants.TEST_EXECUTION_SUMMARY.format(name + ' ' + str(time.time())))
-
-                #test_exec_info.summary = test_exec_info.summary.format(name + ' ' + str(time.time()))
-                #test_exec.info = test_exec_info
+                if test_exec_info.finishDate is None:
+                    test_exec_info.finishDate = _get_test_date(result, constants.ATTRIB_STARTTIME)
+
+                # top suite of the suite path
+                name = result.suites[0] if result.suites else ''
+
+                if test_exec_info.summary is None :
+                    test_exec_info.summary = constants.TEST_EXECUTION_SUMMARY.format(name + ' ' + str(time.time()))
+
+                test_exec.info = test_exec_info
                 test_execs[testexec_key] = test_exec
 
-        element.clear()
-        for ancestor in element.xpath(constants.XPATH_ANCESTOR):
-            while ancestor.getprevious() is not None:
-                del ancestor.getparent()[0]
+    return test_execs
+
+
+def expand_files(patterns):
+    """
+    Expand the output files given in the command line
+
+    :param patterns: Paths or glob patterns of output files
+    :return: List of output files, in the given order and sorted for each pattern. A pattern that matches no file
+        is kept, so that it is reported when it is parsed
+    """
+    xml_files = []
+    found = set()
+    for pattern in patterns:
+        for xml_file in sorted(glob.glob(pattern)) or [pattern]:
+            if xml_file not in found:
+                found.add(xml_file)
+                xml_files.append(xml_file)
+    return xml_files
+
 
+def merge_test_execs(test_execs_list):
+    """
+    Merge the test executions imported from several output files by test execution key. The tests of a key are kept
+    in the order of the files and its test execution keeps the info of the first file.
+
+    :param test_execs_list: Test executions of each output file
+    :return: Test executions to import
+    """
+    merged = {}
+    for test_execs in test_execs_list:
+        for key, test_exec in test_execs.items():
+            if key in merged:
+                merged[key].tests.extend(test_exec.tests)
+            else:
+                merged[key] = test_exec
+    return merged
+
+
+def _init_import_worker(utc_offset, max_comment_bytes, profiling=False):
+    """
+    Set the module globals of the run in a parse worker process
+    """
+    global timestamps
+    timestamps = rfw2xray_dates.TimestampConverter(utc_offset)
+    TestStep.max_comment_bytes = max_comment_bytes
+    rfw2xray_profile.profiler.reset(profiling)
+    # the evidences found by a worker are prefetched by the main process, once adopted
+    evidence_store.start_prefetch(0)
+
+
+def _import_file(job):
+    """
+    Import one output file
+
+    :param job: (xml_file, import_filters, filter_option, test_steps_filter, evidences_import, debug_mode,
+        parser_engine, test_workers, test_exec_info_values)
+    :return: Test executions of the output file
+    """
+    xml_file, filters, filter_option, test_steps_filter, evidences_import, debug_mode, parser_engine, \
+        test_workers, test_exec_info_values = job
+    if filters:
+        return filtering_import(xml_file, test_steps_filter, evidences_import, filters, filter_option, debug_mode,
+                                parser_engine, test_workers, **test_exec_info_values)
+    return no_filtering_import(xml_file, test_steps_filter, evidences_import, debug_mode, parser_engine,
+                               test_workers, **test_exec_info_values)
+
+
+def _import_file_worker(job):
+    """
+    Import one output file, in a parse worker process
+
+    :return: Test executions of the output file, and the phases and counters of the profiler
+    """
+    return _import_file(job), rfw2xray_profile.profiler.collect()
+
+
+def _merge_profile(imported):
+    """
+    Register in the profiler of the run the phases and counters of a file imported by a worker
+
+    :param imported: Test executions of the file, and the phases and counters of the worker
+    :return: Test executions of the file
+    """
+    test_execs, collected = imported
+    rfw2xray_profile.profiler.merge(collected)
+    return test_execs
+
+
+def _adopt_test_evidences(test):
+    """
+    Register in the evidence store of the run the evidences of a test parsed by a worker
+    """
+    for evidence in test.evidences or ():
+        evidence.data = evidence_store.adopt(evidence.data)
+    for step in test.steps:
+        for evidence in step.evidences:
+            evidence.data = evidence_store.adopt(evidence.data)
+
+
+def _adopt_evidences(test_execs):
+    """
+    Register in the evidence store of the run the evidences found by the parse workers
+
+    :return: Test executions
+    """
+    for test_exec in test_execs.values():
+        for test in test_exec.tests:
+            _adopt_test_evidences(test)
     return test_execs
 
-def send_request(test_exec, new_test_exec, cert, oauth_client, debug_mode):
+
+def import_files(xml_files, workers, import_filters, filter_option, test_steps_filter, evidences_import, debug_mode,
+                 parser_engine=constants.PARSER_ENGINE_DEFAULT, test_workers=1, **kwargs):
+    """
+    Import several output files, parsed by a pool of processes, and merge their test executions. The tests of a
+    file are parsed by test workers only when the files are parsed in this process, as pool processes cannot
+    have their own pool.
+
+    :param xml_files: Robot Framework output XML files
+    :param workers: Number of processes parsing output files at the same time
+    :param import_filters: Importation filters, empty to import every test
+    :param filter_option: Filter option, either intersaction or union
+    :param test_steps_filter: Filtering of test steps
+    :param evidences_import: Evidences selection
+    :param parser_engine: Parser engine, "tree" or "target"
+    :param test_workers: Number of processes parsing the tests of a file, 1 to parse them with the file
+    :return: Test executions to import, merged by key
+    """
+    if rfw2xray_profile.profiler.enabled:
+        for xml_file in xml_files:
+            if os.path.isfile(xml_file):
+                rfw2xray_profile.count('output_files')
+                rfw2xray_profile.count('output_bytes', os.path.getsize(xml_file))
+
+    if workers <= 1 or len(xml_files) <= 1:
+        return merge_test_execs(_import_file((xml_file, import_filters, filter_option, test_steps_filter,
+                                              evidences_import, debug_mode, parser_engine, test_workers, kwargs))
+                                for xml_file in xml_files)
+
+    jobs = [(xml_file, import_filters, filter_option, test_steps_filter, evidences_import, debug_mode, parser_engine,
+             1, kwargs) for xml_file in xml_files]
+
+    pool = multiprocessing.Pool(min(workers, len(jobs)), _init_import_worker,
+                                (timestamps.offset, TestStep.max_comment_bytes, rfw2xray_profile.profiler.enabled))
+    try:
+        # the evidences of each file are adopted, and prefetched, as soon as the file is imported
+        return merge_test_execs(_adopt_evidences(_merge_profile(imported))
+                                for imported in pool.imap(_import_file_worker, jobs))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def send_request(test_exec, new_test_exec, cert, oauth_client, debug_mode, max_payload_bytes=None, session=None,
+                 journal=None, journal_key=None):
     """
     Sends a request to import test execution via JIRA-XRAY API
 
     :param data: JSON data
+    :param max_payload_bytes: Maximum estimated size of each import request, None to import all tests at once
+    :param session: HTTP session shared by the requests of the run
+    :param journal: UploadJournal of the run, the steps it records as done are skipped
+    :param journal_key: Key of the test execution in the journal
     :return:
-        Test Execution Key
+        XRAY response content
+    :raise: Exception if any of the requests fails
     """
+    if session is None:
+        session = rfw2xray_upload.create_session()
+    #   Use basic auth if no OAuth client
+    auth = (username, password) if oauth_client is None else None
     headers = {constants.CONTENT_TYPE: constants.CONTENT_TYPE_JSON}
     url = urljoin(jira_address, endpoint)
     url_create = urljoin(jira_address,'rest/api/2/issue')
-    url_testexec_testplan = urljoin(jira_address,'rest/raven/1.0/api/testplan/{}/testexecution'.format(teb.path_get(test_exec,constants.TESTPLANKEY)))
+    test_plan_key = test_exec.info.testPlanKey if test_exec.info else None
+    url_testexec_testplan = urljoin(jira_address,'rest/raven/1.0/api/testplan/{}/testexecution'.format(test_plan_key))
     output = None 
-    created_test_exec = None
-    try:
-        #   If this exists it mean that we have to create a Test Execution first
-        if new_test_exec:
-            json_new_test_exec = json.dumps(new_test_exec)
-            if debug_mode:
-                print json_new_test_exec
-            if oauth_client is None:
-                #   Create a new issue
-                response = requests.post(url_create, headers=headers, data = json_new_test_exec, auth=(username,password),verify = cert)
-            else:
-                response, content = oauth_client.request(url_create, method="POST", headers=headers, body = json_new_test_exec)
-                if response['status'] != '200':
-                    raise Exception(constants.OAUTH_EXCEPTION_MSG.format(response['status'], content))
-            if debug_mode:
-                print response
-                resp_test = getattr(response,'text')
-                if resp_test:
-                    print response.text
-                
-            response.raise_for_status()
-            #   Get Key from the created Issue and add it to the Test Execution JSON in order to update the empty issue recently created
-            created_test_exec = response.json().get('key')
-            teb.path_set(test_exec, constants.TESTEXECUTIONKEY, created_test_exec)
 
+    created_key = journal.created_key(journal_key) if journal is not None else None
 
+    #   If this exists it mean that we have to create a Test Execution first
+    if new_test_exec and created_key is not None:
+        #   Created by a previous attempt of the run
+        test_exec.testExecutionKey = created_key
+    elif new_test_exec:
+        json_new_test_exec = json.dumps(new_test_exec)
+        if debug_mode:
+            print json_new_test_exec
+        #   Create a new issue
+        #   Not idempotent, a retry after the issue was created would create a second test execution
+        response = rfw2xray_upload.post(session, url_create, headers, json_new_test_exec, auth, oauth_client, cert,
+                                        debug_mode, idempotent=False)
+        #   Get Key from the created Issue and add it to the Test Execution JSON in order to update the empty issue recently created
+        test_exec.testExecutionKey = response.json().get('key')
+        if journal is not None:
+            journal.record_created(journal_key, test_exec.testExecutionKey)
+
+    test_exec_key = test_exec.testExecutionKey
 
-        json_test_exec = json.dumps(test_exec)
+    if debug_mode:
+        with open(constants.DEBUG_DUMP_FILE.format(test_exec_key), 'w') as f:
+            for chunk in teb.iter_json(test_exec):
+                f.write(chunk)
+
+    #   The test execution JSON is streamed into the request body, evidences are read while it is sent.
+    #   With a maximum payload size, the tests are imported with several requests to the same test execution
+    for part, payload in enumerate(teb.split_test_exec(test_exec, max_payload_bytes)):
+        imported = journal.imported(journal_key, part) if journal is not None else None
+        if imported is not None:
+            output = imported
+            continue
+        response = rfw2xray_upload.post(session, url, headers, functools.partial(teb.iter_json, payload), auth,
+                                        oauth_client, cert, debug_mode)
+        output = response.text
+        if journal is not None:
+            journal.record_imported(journal_key, part, output)
+
+    if test_plan_key and not (journal is not None and journal.linked(journal_key)):
+        test_plan_data = {"add" : [test_exec_key]}
         if debug_mode:
-            with open('dump.json', 'w') as f:
-                json.dump(test_exec,f)
-        #   Try basic auth if no OAuth client
-        if oauth_client is None:
-            
-            response = requests.post(url, headers=headers, data=json_test_exec, auth=(username, password), verify = cert)
-            if debug_mode:
-                print response.text
-                print response
-            response.raise_for_status()
-            output = response.text
-
-            if teb.path_get(test_exec,constants.TESTPLANKEY):
-                test_plan_data = {"add" : [created_test_exec]}        
-                response = requests.post(url_testexec_testplan, headers=headers, data=json.dumps(test_plan_data), auth=(username, password), verify = cert)
-                if debug_mode:
-                    print "Test plan response:"
-                    print response.text
-                    print response
-                response.raise_for_status      
-        else:
-            resp, content = oauth_client.request(url, method="POST", body = json_test_exec, headers = headers)
-            if resp['status'] != '200':
-                raise Exception(constants.OAUTH_EXCEPTION_MSG.format(resp['status'], content))
-            #return content
-            output = content
-
-            if teb.path_get(test_exec,constants.TESTPLANKEY):
-                test_plan_data = {"add" : [created_test_exec]}        
-                resp, content = oauth_client.request(url_testexec_testplan, method="POST", body = json_test_exec, headers = headers)
-                
-                if resp['status'] != '200':
-                    raise Exception(constants.OAUTH_EXCEPTION_MSG.format(resp['status'], content))
-    
-        return output
+            print "Test plan request:"
+        rfw2xray_upload.post(session, url_testexec_testplan, headers, json.dumps(test_plan_data), auth, oauth_client,
+                             cert, debug_mode)
+        if journal is not None:
+            journal.record_linked(journal_key)
 
-    except Exception as e:
-        print 'exception: '
-        print e.message
-        sys.exit(1)
+    return output
+
+
+def _new_test_exec(key, test_exec, components, labels):
+    """
+    Jira fields of the Test Execution issue to create for a test execution
+
+    :param key: Test execution key, NO_TESTEXEC_KEY if the test execution has to be created
+    :param test_exec: Test execution record
+    :param components: Jira components to add to the test execution
+    :param labels: Labels of the test execution separated by "|"
+    :return: Dict with the new issue, empty if the test execution already exists
+    """
+    new_test_exec = {}
+
+    # If key from test_exec is NO_TESTEXEC_KEY means that we have to create a test execution, which means that we need to
+    # set the new test execution Jira fields  
+    if key == constants.NO_TESTEXEC_KEY:
+        project_key = test_exec.tests[0].testKey.split('-')[0]
+        new_test_exec = {
+            "fields": {
+                "project": {
+                    "key": project_key
+                },
+                "summary": test_exec.info.summary,
+                "issuetype":{
+                    "name": "Test Execution"
+                },
+                "components": [] if not components else [{"name": component_name } for component_name in components ],
+                "labels": [] if not labels else labels.split('|')
+            }
+        }
+    return new_test_exec
 
 if __name__ == '__main__':
 
+    # parse workers of the executable built by pyinstaller
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser(
         description=constants.DESCRIPTION.encode('utf-8'),
         epilog=constants.EPILOG,
         formatter_class=RawTextHelpFormatter
     )
 
-    parser.add_argument(constants.FILE, help=constants.FILE_HELP)
+    parser.add_argument(constants.FILE, nargs='+', help=constants.FILE_HELP)
     parser.add_argument(constants.URL, help=constants.URL_HELP)
     parser.add_argument(constants.USERNAME, help=constants.USERNAME_HELP)
     
@@ -713,6 +902,72 @@ if __name__ == '__main__':
     parser.add_argument(constants.CERTIFICATE, constants.CERTIFICATE_EXTENDED,
                         help=constants.CERTIFICATE_HELP)
 
+    parser.add_argument(constants.EVIDENCE_CACHE, constants.EVIDENCE_CACHE_EXTENDED, type=constants.EVIDENCE_CACHE_TYPE,
+                        default=constants.EVIDENCE_CACHE_DEFAULT, help=constants.EVIDENCE_CACHE_HELP)
+
+    parser.add_argument(constants.EVIDENCE_WORKERS, constants.EVIDENCE_WORKERS_EXTENDED, type=constants.EVIDENCE_WORKERS_TYPE,
+                        default=constants.EVIDENCE_WORKERS_DEFAULT, help=constants.EVIDENCE_WORKERS_HELP)
+
+    parser.add_argument(constants.MAX_PAYLOAD_BYTES, constants.MAX_PAYLOAD_BYTES_EXTENDED, type=constants.MAX_PAYLOAD_BYTES_TYPE,
+                        help=constants.MAX_PAYLOAD_BYTES_HELP)
+
+    parser.add_argument(constants.UPLOAD_CONCURRENCY, constants.UPLOAD_CONCURRENCY_EXTENDED, type=constants.UPLOAD_CONCURRENCY_TYPE,
+                        default=constants.UPLOAD_CONCURRENCY_DEFAULT, help=constants.UPLOAD_CONCURRENCY_HELP)
+
+    parser.add_argument(constants.COMPRESS, constants.COMPRESS_EXTENDED, action=constants.COMPRESS_ACTION,
+                        help=constants.COMPRESS_HELP)
+
+    parser.add_argument(constants.MAX_RETRIES, constants.MAX_RETRIES_EXTENDED, type=constants.MAX_RETRIES_TYPE,
+                        default=constants.MAX_RETRIES_DEFAULT, help=constants.MAX_RETRIES_HELP)
+
+    parser.add_argument(constants.RETRY_BUDGET, constants.RETRY_BUDGET_EXTENDED, type=constants.RETRY_BUDGET_TYPE,
+                        default=constants.RETRY_BUDGET_DEFAULT, help=constants.RETRY_BUDGET_HELP)
+
+    parser.add_argument(constants.RATE_LIMIT, constants.RATE_LIMIT_EXTENDED, type=constants.RATE_LIMIT_TYPE,
+                        help=constants.RATE_LIMIT_HELP)
+
+    parser.add_argument(constants.MAX_COMMENT_BYTES, constants.MAX_COMMENT_BYTES_EXTENDED, type=constants.MAX_COMMENT_BYTES_TYPE,
+                        help=constants.MAX_COMMENT_BYTES_HELP)
+
+    parser.add_argument(constants.UTC_OFFSET, constants.UTC_OFFSET_EXTENDED, type=rfw2xray_dates.utc_offset,
+                        default=constants.UTC_OFFSET_DEFAULT, help=constants.UTC_OFFSET_HELP)
+
+    parser.add_argument(constants.PARSE_WORKERS, constants.PARSE_WORKERS_EXTENDED, type=constants.PARSE_WORKERS_TYPE,
+                        help=constants.PARSE_WORKERS_HELP)
+
+    parser.add_argument(constants.TEST_WORKERS, constants.TEST_WORKERS_EXTENDED, type=constants.TEST_WORKERS_TYPE,
+                        default=constants.TEST_WORKERS_DEFAULT, help=constants.TEST_WORKERS_HELP)
+
+    parser.add_argument(constants.PARSER_ENGINE, constants.PARSER_ENGINE_EXTENDED, choices=constants.PARSER_ENGINE_CHOICES,
+                        default=constants.PARSER_ENGINE_DEFAULT, help=constants.PARSER_ENGINE_HELP)
+
+    parser.add_argument(constants.INCREMENTAL, constants.INCREMENTAL_EXTENDED, action=constants.INCREMENTAL_ACTION,
+                        help=constants.INCREMENTAL_HELP)
+
+    parser.add_argument(constants.INCREMENTAL_CACHE_FILE, constants.INCREMENTAL_CACHE_FILE_EXTENDED,
+                        default=constants.INCREMENTAL_CACHE_FILE_DEFAULT, help=constants.INCREMENTAL_CACHE_FILE_HELP)
+
+    parser.add_argument(constants.INCREMENTAL_CACHE_SIZE, constants.INCREMENTAL_CACHE_SIZE_EXTENDED,
+                        type=constants.INCREMENTAL_CACHE_SIZE_TYPE, default=constants.INCREMENTAL_CACHE_SIZE_DEFAULT,
+                        help=constants.INCREMENTAL_CACHE_SIZE_HELP)
+
+    parser.add_argument(constants.RESUME, constants.RESUME_EXTENDED, action=constants.RESUME_ACTION,
+                        help=constants.RESUME_HELP)
+
+    parser.add_argument(constants.JOURNAL_FILE, constants.JOURNAL_FILE_EXTENDED, nargs=constants.JOURNAL_FILE_NARGS,
+                        const=constants.JOURNAL_FILE_CONST, help=constants.JOURNAL_FILE_HELP)
+
+    parser.add_argument(constants.PROFILE, constants.PROFILE_EXTENDED, nargs=constants.PROFILE_NARGS,
+                        const=constants.PROFILE_CONST, help=constants.PROFILE_HELP)
+
+    parser.add_argument(constants.PROFILE_CPU, constants.PROFILE_CPU_EXTENDED, action=constants.PROFILE_CPU_ACTION,
+                        help=constants.PROFILE_CPU_HELP)
+
+    parser.add_argument(constants.PROFILE_MEMORY, constants.PROFILE_MEMORY_EXTENDED,
+                        action=constants.PROFILE_MEMORY_ACTION, help=constants.PROFILE_MEMORY_HELP)
+
+    parser.add_argument(constants.TRANSLATOR, constants.TRANSLATOR_EXTENDED, help=constants.TRANSLATOR_HELP)
+
     parser.add_argument(constants.COMPONENTS, constants.COMPONENTS_EXTENDED, nargs='+',
                         help=constants.COMPONENTS_HELP)
 
@@ -724,8 +979,20 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    # output XML file
-    file = args.file
+    # phases and counters of the run, reported at exit
+    if args.profile:
+        rfw2xray_profile.profiler.start(args.profile, args.profile_cpu, args.profile_memory)
+
+    # translator of the records, checked before anything is parsed or sent
+    if args.translator:
+        try:
+            teb.load_translator(args.translator)
+        except (IOError, ValueError) as e:
+            print constants.TRANSLATOR_LOAD_ERROR_MSG.format(args.translator, e)
+            sys.exit(1)
+
+    # output XML files
+    xml_files = expand_files(args.file)
 
     # JIRA server configuration
     jira_address = args.url   # 'http://10.12.7.54:8080'  # CHANGE
@@ -764,6 +1031,15 @@ if __name__ == '__main__':
     # debug flag
     debug_mode = args.debug
 
+    # maximum size of test step comments
+    TestStep.max_comment_bytes = args.max_comment_bytes
+
+    # UTC offset of the test dates
+    timestamps = rfw2xray_dates.TimestampConverter(args.utc_offset)
+
+    # evidences cache
+    evidence_store = testexec_evidences.EvidenceStore(args.evidence_cache)
+
     # path to certicate
     certificate = args.certificate if args.certificate else False
 
@@ -803,45 +1079,100 @@ if __name__ == '__main__':
  
     if debug_mode:
         print "Arguments: " + str(test_exec_info_values)
-    # start_time = time.time()
 
-    if filter_test_suite or filter_test_case or filter_tag:
-        test_execs = filtering_import(file, test_steps_filter,
-                                      evidences_import, import_filters, filter_option,  debug_mode, **test_exec_info_values)
-    else:
-        test_execs = no_filtering_import(file, test_steps_filter, evidences_import,  debug_mode, **test_exec_info_values)
+    # evidences are read and encoded concurrently as soon as the parse finds them. With an incremental import,
+    # only the evidences of the tests changed are read, once the output files are parsed
+    if args.evidence_workers > 0 and not args.incremental:
+        evidence_store.start_prefetch(args.evidence_workers)
+
+    # output files are parsed in parallel, their test executions are merged by key
+    with rfw2xray_profile.timer('import'):
+        test_execs = import_files(xml_files, args.parse_workers or multiprocessing.cpu_count(), import_filters,
+                                  filter_option, test_steps_filter, evidences_import, debug_mode, args.parser_engine,
+                                  args.test_workers, **test_exec_info_values)
+
+    # with an incremental import, only the tests changed since the last import to their test execution are sent
+    import_cache = None
+    prefetched_evidences = None
+    if args.incremental:
+        import_cache = rfw2xray_cache.ImportCache(args.incremental_cache_file, args.incremental_cache_size)
+        prefetched_evidences = []
+        for key, test_exec in test_execs.items():
+            if key != constants.NO_TESTEXEC_KEY:
+                changed_tests = import_cache.changed_tests(key, test_exec.tests)
+                if debug_mode:
+                    print constants.INCREMENTAL_SKIPPED_MSG.format(len(test_exec.tests) - len(changed_tests), key)
+                if not changed_tests:
+                    print constants.INCREMENTAL_UP_TO_DATE_MSG.format(key)
+                    del test_execs[key]
+                    continue
+                test_exec.tests = changed_tests
+            for test in test_exec.tests:
+                prefetched_evidences.extend(rfw2xray_cache.iter_evidences(test))
+
+    # wait for the evidences prefetched while parsing, or read those of the tests changed, concurrently
+    if args.evidence_workers > 0:
+        with rfw2xray_profile.timer('prefetch'):
+            if prefetched_evidences is None:
+                evidence_store.wait_prefetch()
+            else:
+                evidence_store.prefetch(args.evidence_workers, prefetched_evidences)
 
     # if no password create a OAuth client
     oauth_client = None 
     if not password:
         oauth_client = rfw2xray_auth.create_oauth_client(os.path.join(os.path.dirname(os.path.abspath(__file__)), constants.OAUTH_CONFIG_FILE))
 
-    for key, test_exec in test_execs.items():
-        new_test_exec = {}
-       
-        # If key from test_exec is NO_TESTEXEC_KEY means that we have to create a test execution, which means that we need to
-        # set the new test execution Jira fields  
-        if key == constants.NO_TESTEXEC_KEY:
-            project_key = teb.path_get(teb.path_get(test_exec, constants.TESTS)[0],constants.TEST_TESTKEY).split('-')[0]
-            new_test_exec = {
-                "fields": {
-                    "project": {
-                        "key": project_key
-                    },
-                    "summary": teb.path_get(test_exec,constants.SUMMARY),
-                    "issuetype":{
-                        "name": "Test Execution"
-                    },
-                    "components": [] if not args.components else [{"name": component_name } for component_name in args.components ],
-                    "labels": [] if not args.labels else args.labels.split('|')
-                }
-            }
+    # one HTTP session for every request, test executions are sent concurrently. Throttled requests are retried
+    scheduler = rfw2xray_upload.RequestScheduler(args.max_retries, args.retry_budget, args.rate_limit)
+    session = rfw2xray_upload.create_session(args.upload_concurrency, scheduler, args.compress)
+
+    # steps done by the imports, to resume the run if some test executions fail. Only journaled on demand, each
+    # step is synced to the disk
+    journal = None
+    if args.resume or args.journal_file:
+        journal_file = args.journal_file or constants.JOURNAL_FILE_CONST
+        journal = rfw2xray_journal.UploadJournal(journal_file, rfw2xray_journal.run_id(xml_files, vars(args)),
+                                                 args.resume)
+        if args.resume and not journal.resumed:
+            print constants.JOURNAL_NOT_RESUMED_MSG.format(journal_file)
+
+    def send_test_exec(key, test_exec):
+        new_test_exec = _new_test_exec(key, test_exec, args.components, args.labels)
+        output = send_request(test_exec, new_test_exec, certificate, oauth_client, debug_mode, args.max_payload_bytes,
+                              session, journal, key)
+        # created test executions are created again by the next import, their tests are not kept
+        if import_cache is not None and key != constants.NO_TESTEXEC_KEY:
+            import_cache.record(key, test_exec.tests)
+        return output
+
+    test_exec_items = test_execs.items()
+    rfw2xray_profile.count('test_executions', len(test_exec_items))
+    with rfw2xray_profile.timer('upload'):
+        responses, errors = rfw2xray_upload.upload(send_test_exec, test_exec_items, args.upload_concurrency)
 
-        response = send_request(test_exec, new_test_exec, certificate, oauth_client, debug_mode)
+    for key, _ in test_exec_items:
+        response = responses.get(key)
         if response:
             json_response = json.loads(response)
             if debug_mode:
-                test_keys = []
                 print json_response
             test_exec_key = json_response[constants.TEST_EXEC_ISSUE][constants.KEY]
             print test_exec_key
+
+        if key in errors:
+            print 'exception: '
+            print constants.UPLOAD_ERROR_MSG.format(key, errors[key])
+
+    if import_cache is not None:
+        import_cache.close()
+
+    if journal is not None:
+        journal.close(completed=not errors)
+
+    if errors:
+        if journal is not None:
+            print constants.JOURNAL_RESUME_MSG.format(constants.RESUME_EXTENDED)
+        else:
+            print constants.JOURNAL_DISABLED_MSG.format(constants.RESUME_EXTENDED, constants.JOURNAL_FILE_EXTENDED)
+        sys.exit(1)
@@ -0,0 +1,372 @@
+"""
+    HTTP transport of the imports to XRAY.
+
+    Every request of a run goes through one requests Session, so the connections to Jira are kept alive and reused
+    by the imports of all test executions, which are sent concurrently.
+
+    The requests of the session are scheduled by a RequestScheduler: the requests sent to each host can be rate
+    limited by a token bucket, and requests throttled by Jira (429, 503 with Retry-After) or failed by the connection
+    are retried after a jittered exponential backoff, within a retry budget shared by the whole run.
+
+    Import bodies can be gzip compressed while they are streamed. The first compressed request probes the server:
+    if it rejects the encoding, the request is sent again uncompressed and the session stops compressing.
+
+    The OAuth signature covers the hash of the body, which must be known before the body is sent. A streamed body
+    signed with OAuth is therefore built once, spooled to a temporary file while it is hashed, and sent from the file
+    by each attempt of the request.
+"""
+import random
+import tempfile
+import threading
+import time
+import urlparse
+import zlib
+from email.utils import parsedate_tz, mktime_tz
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import constants
+import rfw2xray_auth
+import rfw2xray_profile
+
+
+class TokenBucket(object):
+    """
+    Rate limit of the requests sent to a host
+    """
+
+    def __init__(self, rate, burst=constants.RATE_LIMIT_BURST):
+        """
+        :param rate: Requests per second
+        :param burst: Requests sent at once after an idle period
+        """
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting until one is available. Tokens are reserved under the lock and waited for out of it,
+        so concurrent requests wait in turn.
+        """
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate) - 1
+            self.updated = now
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def retry_after(response):
+    """
+    :param response: Response
+    :return: Delay in seconds asked by the Retry-After header of the response, None without header
+    """
+    value = response.headers.get(constants.RETRY_AFTER) if response is not None else None
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        delay = mktime_tz(date) - time.time()
+    return min(max(delay, 0.0), constants.RETRY_AFTER_MAX)
+
+
+def retryable(response, idempotent=True):
+    """
+    :param response: Response
+    :param idempotent: False for a request that must not be processed twice, e.g. the creation of an issue. It is
+        only retried when the server did not process it: throttled, or unavailable with a Retry-After header
+    :return: True if the request can be retried
+    """
+    if idempotent:
+        return response.status_code in constants.RETRY_STATUS_CODES
+    return response.status_code in constants.RETRY_UNPROCESSED_STATUS_CODES or \
+        (response.status_code == constants.RETRY_UNAVAILABLE_STATUS_CODE and retry_after(response) is not None)
+
+
+class RequestScheduler(object):
+    """
+    Rate limits and retries of the requests of a run
+    """
+
+    def __init__(self, max_retries=constants.MAX_RETRIES_DEFAULT, retry_budget=constants.RETRY_BUDGET_DEFAULT,
+                 rate_limit=None, backoff_base=constants.RETRY_BACKOFF_BASE, backoff_max=constants.RETRY_BACKOFF_MAX):
+        """
+        :param max_retries: Number of retries of a request
+        :param retry_budget: Number of retries of all the requests of the run
+        :param rate_limit: Requests per second sent to each host, None for no limit
+        :param backoff_base: Delay of the first retry, doubled at each retry
+        :param backoff_max: Maximum backoff delay
+        """
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.rate_limit = rate_limit
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # token bucket by host
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """
+        Wait until a request can be sent to the host of an url
+        """
+        if not self.rate_limit:
+            return
+        host = urlparse.urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate_limit)
+        bucket.acquire()
+
+    def retry_delay(self, attempt, response=None):
+        """
+        Delay before retrying a request, the delay asked by its Retry-After header or else a random delay up to an
+        exponential backoff. A retry is taken from the retry budget of the run.
+
+        :param attempt: Number of retries of the request already done
+        :param response: Response throttled, None for a connection error
+        :return: Delay in seconds, None if the request is not retried
+        """
+        if attempt >= self.max_retries:
+            return None
+        with self._lock:
+            if self.retry_budget <= 0:
+                return None
+            self.retry_budget -= 1
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return delay
+
+
+def gzip_chunks(chunks, level=constants.GZIP_LEVEL):
+    """
+    Gzip compress a streamed body
+
+    :param chunks: Iterable with the body chunks
+    :param level: Compression level
+    :return: Iterator of the compressed chunks
+    """
+    return rfw2xray_profile.timed_iter('gzip', _gzip_chunks(chunks, level), 'compressed_bytes')
+
+
+def _gzip_chunks(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, constants.GZIP_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class SpooledBody(object):
+    """
+    Streamed body written once to a temporary file, kept in memory up to SPOOL_MEMORY_BYTES, and hashed while it is
+    written
+    """
+
+    def __init__(self, chunks, compressed=False):
+        """
+        :param chunks: Iterable with the body chunks
+        :param compressed: True if the chunks are gzip compressed
+        """
+        self.compressed = compressed
+        self.file = tempfile.SpooledTemporaryFile(max_size=constants.SPOOL_MEMORY_BYTES)
+        body_hash = sha1()
+        with rfw2xray_profile.timer('oauth_body_hash'):
+            for chunk in chunks:
+                body_hash.update(chunk)
+                self.file.write(chunk)
+        self.digest = body_hash.digest()
+
+    def chunks(self):
+        """
+        :return: Iterator of the body chunks, read from the start of the file
+        """
+        self.file.seek(0)
+        return iter(lambda: self.file.read(constants.STREAM_CHUNK_SIZE), '')
+
+    def close(self):
+        self.file.close()
+
+
+class Session(requests.Session):
+    """
+    requests Session whose requests are scheduled by a RequestScheduler, and whose streamed bodies are gzip
+    compressed while the server accepts them
+    """
+
+    def __init__(self, scheduler=None, compress=False):
+        super(Session, self).__init__()
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.compress = compress
+        # True once the server accepted a compressed request, its errors are then not taken for a rejection
+        self.compress_accepted = False
+
+
+def create_session(concurrency=constants.UPLOAD_CONCURRENCY_DEFAULT, scheduler=None, compress=False):
+    """
+    Create the HTTP session shared by all requests of a run
+
+    :param concurrency: Number of test executions sent at the same time
+    :param scheduler: RequestScheduler of the run, retries with the default limits if not set
+    :param compress: True to gzip compress the streamed bodies
+    :return: Session
+    """
+    session = Session(scheduler, compress)
+    adapter = HTTPAdapter(pool_connections=constants.HTTP_POOL_CONNECTIONS, pool_maxsize=max(concurrency, 1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def post(session, url, headers, body, auth=None, oauth_client=None, cert=False, debug_mode=False, idempotent=True):
+    """
+    Send a POST request, with basic authentication or signed by the OAuth client. With a Session, the request is
+    rate limited and retried by its scheduler, the body is produced again for each attempt, and a streamed body is
+    compressed if the session compresses. A streamed body signed by the OAuth client is produced once, spooled while
+    its hash is computed, and sent from the spool by each attempt.
+
+    :param session: HTTP session
+    :param url: Request url
+    :param headers: Request headers
+    :param body: Request body, either a string or a function returning the body chunks to stream
+    :param auth: Basic authentication (username, password)
+    :param oauth_client: OAuth client, if set basic authentication is not used
+    :param cert: Path to SSL certificate, False to skip verification
+    :param idempotent: False for a request that must not be processed twice, e.g. the creation of an issue. It is
+        only retried when the server did not process it: throttled (429), unavailable with a Retry-After header
+        (503) or not connected (connect timeout)
+    :return: Response
+    :raise: requests.HTTPError or Exception for OAuth if the response is not successful
+    """
+    scheduler = getattr(session, 'scheduler', None)
+    if oauth_client is not None:
+        auth = None
+
+    # body spooled for the OAuth body hash, sent again by the retries. Its file is deleted when it is closed, or
+    # collected if the request fails
+    spooled = None
+    attempt = 0
+    while True:
+        if scheduler is not None:
+            with rfw2xray_profile.timer('rate_limit_wait'):
+                scheduler.acquire(url)
+
+        compress = callable(body) and getattr(session, 'compress', False)
+        request_headers = dict(headers)
+        request_body = body
+        if compress:
+            request_headers[constants.CONTENT_ENCODING] = constants.CONTENT_ENCODING_GZIP
+            request_body = lambda: gzip_chunks(body())
+        if oauth_client is not None:
+            # the body is built once and spooled, and spooled again only if it is no longer compressed. The
+            # body hash is the hash of the body sent, compressed or not
+            if callable(request_body):
+                if spooled is None or spooled.compressed != compress:
+                    if spooled is not None:
+                        spooled.close()
+                    spooled = SpooledBody(request_body(), compress)
+                body_hash = spooled.digest
+                request_body = spooled.chunks
+            else:
+                body_hash = sha1(request_body).digest()
+            # signed again at each attempt, the nonce and timestamp of a signature are only valid once
+            request_headers.update(rfw2xray_auth.sign_streamed_request(oauth_client, url, "POST", body_hash))
+
+        rfw2xray_profile.count('http_requests')
+        try:
+            with rfw2xray_profile.timer('http'):
+                response = session.post(url, headers=request_headers,
+                                        data=request_body() if callable(request_body) else request_body,
+                                        auth=auth, verify=cert)
+        except requests.ConnectionError as e:
+            # a request not idempotent may have been processed before its connection failed
+            if not idempotent and not isinstance(e, requests.ConnectTimeout):
+                raise
+            delay = scheduler.retry_delay(attempt) if scheduler is not None else None
+            if delay is None:
+                raise
+            reason = e
+        else:
+            if compress and not session.compress_accepted:
+                if response.status_code in constants.COMPRESSION_REJECTED_STATUS_CODES:
+                    # the server does not accept compressed bodies, they are sent uncompressed from now on
+                    session.compress = False
+                    if debug_mode:
+                        print constants.COMPRESSION_REJECTED_MSG.format(response.status_code)
+                    continue
+                if response.ok:
+                    session.compress_accepted = True
+            if not retryable(response, idempotent) or scheduler is None:
+                break
+            delay = scheduler.retry_delay(attempt, response)
+            if delay is None:
+                break
+            reason = response.status_code
+
+        if debug_mode:
+            print constants.RETRY_MSG.format(url, delay, reason)
+        rfw2xray_profile.count('http_retries')
+        with rfw2xray_profile.timer('retry_wait'):
+            time.sleep(delay)
+        attempt += 1
+
+    if spooled is not None:
+        spooled.close()
+
+    if debug_mode:
+        print response.text
+        print response
+
+    if oauth_client is not None and not response.ok:
+        raise Exception(constants.OAUTH_EXCEPTION_MSG.format(response.status_code, response.text))
+    response.raise_for_status()
+    return response
+
+
+def upload(send, items, concurrency=constants.UPLOAD_CONCURRENCY_DEFAULT):
+    """
+    Send independent items concurrently, collecting results and errors by key instead of stopping on the
+    first error
+
+    :param send: Function called with the key and value of each item
+    :param items: List of (key, value)
+    :param concurrency: Number of items sent at the same time
+    :return: Dict of results by key; dict of exceptions by key
+    """
+    results = {}
+    errors = {}
+
+    def send_item(item):
+        key, value = item
+        try:
+            results[key] = send(key, value)
+        except Exception as e:
+            errors[key] = e
+
+    if concurrency <= 1 or len(items) <= 1:
+        for item in items:
+            send_item(item)
+    else:
+        pool = ThreadPool(min(concurrency, len(items)))
+        try:
+            pool.map(send_item, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    return results, errors
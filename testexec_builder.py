@@ -1,6 +1,9 @@
 import json
 import constants as c
 import os
+
+import rfw2xray_profile
+from testexec_model import TestExec
 translator = {
     "testexec_key" : "testExecutionKey",
     "project" : "info/project",
@@ -36,41 +39,208 @@ translator = {
 }
 
 
-#    translator = json.load(f)
+# Translator names used to build a test execution
+TRANSLATOR_NAMES = (c.TESTEXECUTIONKEY, c.PROJECT, c.SUMMARY, c.DESCRIPTION, c.USER, c.VERSION, c.REVISION,
+                    c.STARTDATE, c.FINISHDATE, c.TESTPLANKEY, c.TEST_EXECUTION_INFO_TESTENVIRONMENTS_KEY, c.TESTS,
+                    c.TEST_COMMENT, c.TEST_STATUS, c.TEST_FINISH, c.TEST_START, c.TEST_TESTKEY, c.TEST_EXECUTEDBY,
+                    c.TEST_EVIDENCES, c.EVIDENCE_DATA, c.EVIDENCE_FILENAME, c.EVIDENCE_CONTENTTYPE, c.STEPS,
+                    c.STEP_STATUS, c.STEP_COMMENT, c.STEP_EVIDENCES)
+
+
+def _compile_path(path):
+    """
+    Compile a translator path into a setter, so that no string work is done when a value is set
+
+    :param path: Path in the JSON dict, keys separated by "/"
+    :return: Function setting a value at the path of a JSON dict, creating its missing parents
+    """
+    if not isinstance(path, basestring):
+        raise ValueError(c.TRANSLATOR_PATH_ERROR_MSG.format(path))
+    keys = path.split("/")
+    if not all(keys):
+        raise ValueError(c.TRANSLATOR_PATH_ERROR_MSG.format(path))
+    parents = tuple(keys[:-1])
+    key = keys[-1]
+
+    if not parents:
+        def new(dictionary, newValue):
+            dictionary[key] = newValue
+    else:
+        def new(dictionary, newValue):
+            for item in parents:
+                if item not in dictionary:
+                    dictionary[item] = {}
+                dictionary = dictionary[item]
+            dictionary[key] = newValue
+
+    return new
+
+
+def compile_translator(translator):
+    """
+    Validate a translator and compile its paths into setters
+
+    :param translator: Dict of translator names to paths in the JSON dict
+    :return: Dict of translator names to setters
+    """
+    missing = [name for name in TRANSLATOR_NAMES if name not in translator]
+    if missing:
+        raise ValueError(c.TRANSLATOR_MISSING_ERROR_MSG.format(', '.join(missing)))
+    return dict((name, _compile_path(path)) for name, path in translator.items())
 
 
-# Get a path from the JSON dict
-def path_get(dictionary, path):
-    path = translator[path]
-    try:
-        for item in path.split("/"):
-            dictionary = dictionary[item]
-    except:
-        return None
+def load_translator(translator_file):
+    """
+    Use the translator of a JSON file, e.g. testexec_translator.json, instead of the embedded one
+
+    :param translator_file: Path to the translator JSON file
+    """
+    global setters
+    with open(translator_file) as f:
+        setters = compile_translator(json.load(f))
+
+
+# compiled once, when the module is loaded
+setters = compile_translator(translator)
+
+
+# Translate a record into the JSON dict
+def translate(record):
+    """
+    Translate a record (see testexec_model) into a JSON dict following the translator. Values are not copied and
+    nested records are left to be translated when they are reached.
+
+    :param record: Record with a 'translation' of its fields
+    :return: JSON dict
+    """
+    dictionary = {}
+    _translate_into(dictionary, record)
     return dictionary
 
 
-# Set a value in the JSON dict path
-def path_set(dictionary, path, setItem):
-    path = translator[path]
-    path = path.split("/")
-    key = path[-1]
-    if len(path) > 1:
-        dictionary = path_get(dictionary, "/".join(path[:-1]))
-    dictionary[key] = setItem
-
-# New entry to dict
-def path_new(dictionary, path,newValue):
-    path = translator[path]
-    path_splitted = path.split("/")
-    key = path_splitted[-1]
-    path = path_splitted[:-1]
-    
-    for item in path:
-        if item not in dictionary:
-            dictionary[item] = {}
-            dictionary = dictionary[item]
+def _translate_into(dictionary, record):
+    for attribute, name in record.translation:
+        value = getattr(record, attribute)
+        if value is None:
+            continue
+        if name is None:
+            # record merged in the same JSON object, e.g. the test execution info
+            _translate_into(dictionary, value)
         else:
-            dictionary = dictionary[item]
+            setters[name](dictionary, value)
+
+
+# Stream the JSON of a test execution
+def iter_json(test_exec, chunk_size=c.STREAM_CHUNK_SIZE):
+    """
+    Serialize a test execution to JSON as a sequence of chunks, suited to be used as a streamed request body.
+    Records are translated one at a time, and evidence files are read and encoded only when the serializer
+    reaches them.
+
+    :param test_exec: TestExec record or JSON dict
+    :param chunk_size: Minimum size of each yielded chunk, except the last one
+    """
+    return rfw2xray_profile.timed_iter('serialize', _iter_json_chunks(test_exec, chunk_size), 'serialized_bytes')
+
+
+def _iter_json_chunks(test_exec, chunk_size):
+    buffered = []
+    buffered_size = 0
+    for piece in _iter_json_value(test_exec):
+        buffered.append(piece)
+        buffered_size += len(piece)
+        if buffered_size >= chunk_size:
+            yield ''.join(buffered)
+            buffered = []
+            buffered_size = 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+def _iter_json_value(value):
+    if hasattr(value, 'translation'):
+        value = translate(value)
+
+    if isinstance(value, dict):
+        yield '{'
+        separator = ''
+        for key, item in value.items():
+            yield separator + json.dumps(key) + ': '
+            for piece in _iter_json_value(item):
+                yield piece
+            separator = ', '
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '['
+        separator = ''
+        for item in value:
+            yield separator
+            for piece in _iter_json_value(item):
+                yield piece
+            separator = ', '
+        yield ']'
+    elif hasattr(value, 'iter_base64'):
+        # evidence file, base64 never needs JSON escaping
+        yield '"'
+        for piece in value.iter_base64():
+            yield piece
+        yield '"'
+    else:
+        yield json.dumps(value)
+
+
+# Estimate the size of the JSON of a test execution, without building it
+def estimate_json_size(value):
+    """
+    Estimate the size in bytes of the JSON of a value, evidences included, without serializing it. The estimate is
+    an upper bound: strings and keys are measured once escaped, as iter_json writes them
+
+    :param value: Record, JSON dict, list or value
+    :return: Estimated size in bytes
+    """
+    if hasattr(value, 'translation'):
+        value = translate(value)
+
+    if isinstance(value, dict):
+        # key, ": " and ", "
+        return 2 + sum(len(json.dumps(key)) + 4 + estimate_json_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return 2 + sum(2 + estimate_json_size(item) for item in value)
+    if hasattr(value, 'encoded_size'):
+        return 2 + value.encoded_size()
+    # escaped strings, e.g. non-ASCII characters as \uXXXX, new lines and quotes
+    return len(json.dumps(value))
+
+
+# Split a test execution in several imports to the same test execution
+def split_test_exec(test_exec, max_bytes=None):
+    """
+    Split a test execution in payloads whose estimated JSON size is at most max_bytes. The first payload is the
+    test execution with its first tests, the following ones only hold the test execution key and the next tests.
+    The payloads are generated lazily, so the test execution key can be set until the first one is sent.
+    A test bigger than max_bytes is sent alone.
+
+    :param test_exec: TestExec record
+    :param max_bytes: Maximum estimated size of a payload, None to import all tests in a single payload
+    """
+    return rfw2xray_profile.timed_iter('split_payloads', _split_test_exec(test_exec, max_bytes))
+
+
+def _split_test_exec(test_exec, max_bytes):
+    if not max_bytes or not test_exec.tests:
+        yield test_exec
+        return
+
+    payload = TestExec([], test_exec.testExecutionKey, test_exec.info)
+    payload_size = estimate_json_size(payload)
+    for test in test_exec.tests:
+        test_size = 2 + estimate_json_size(test)
+        if payload.tests and payload_size + test_size > max_bytes:
+            yield payload
+
+            payload = TestExec([], test_exec.testExecutionKey)
+            payload_size = estimate_json_size(payload)
+        payload.tests.append(test)
+        payload_size += test_size
 
-    dictionary[key] = newValue
+    yield payload
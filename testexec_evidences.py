@@ -0,0 +1,279 @@
+"""
+    Evidences of a test execution.
+
+    While the Robot Framework output is parsed, evidences are only referenced by their file path. The file content
+    is read and base64 encoded when the test execution JSON is written to the request body, so the payload never
+    has to hold every screenshot of a run in memory.
+
+    The EvidenceStore makes sure that each evidence file is read and encoded once per run: evidence files are
+    identified by path, size and modification time, looked up in the cache before they are read, and their encoded
+    content is kept, by content hash, in a size-bounded LRU cache. Files with the same content share their cached
+    content, and are forgotten with it when it is evicted. The store can prefetch the evidences with a pool of
+    threads, either as soon as the parse finds them or once the output is parsed, so that reading them from slow
+    disks does not stall the parse nor the upload.
+"""
+import base64
+import os
+import threading
+from collections import OrderedDict
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+
+import constants
+import rfw2xray_profile
+
+
+class EvidenceFile(object):
+    """
+    Reference to an evidence file, whose base64 content is produced on demand
+    """
+    __slots__ = ('path', 'key', 'store')
+
+    def __init__(self, path, key=None, store=None):
+        """
+        :param path: Path to the evidence file
+        :param key: Identity of the file in the store, (path, size, modification time)
+        :param store: EvidenceStore that caches the encoded file
+        """
+        self.path = path
+        self.key = key
+        self.store = store
+
+    def __reduce__(self):
+        # the store stays in its process, evidences read by another process are adopted by the local store
+        return EvidenceFile, (self.path, self.key)
+
+    def encoded_size(self):
+        """
+        :return: Size in bytes of the base64 encoded evidence
+        """
+        size = self.key[1] if self.key else os.path.getsize(self.path)
+        return (size + 2) // 3 * 4
+
+    def iter_base64(self, block_size=constants.EVIDENCE_READ_BLOCK_SIZE):
+        """
+        Yield the evidence base64 encoded. Cached evidences are reused, the others are read from the file, either
+        whole to be cached or block by block when they are too big for the cache
+
+        :param block_size: Number of bytes read at a time. Must be a multiple of 3 so that blocks can be encoded
+            independently and concatenated
+        """
+        if self.store is not None and self.store.fits(self.encoded_size()):
+            yield self.store.read(self)
+            return
+
+        rfw2xray_profile.count('evidence_files_read')
+        with open(self.path, 'rb') as evidence_file:
+            while True:
+                with rfw2xray_profile.timer('evidence_read'):
+                    block = evidence_file.read(block_size)
+                if not block:
+                    break
+                rfw2xray_profile.count('evidence_bytes_read', len(block))
+                with rfw2xray_profile.timer('evidence_encode'):
+                    encoded = base64.b64encode(block)
+                yield encoded
+
+
+class EvidenceStore(object):
+    """
+    Evidences of a run, with a LRU cache of their base64 content bounded by its size in bytes
+    """
+
+    def __init__(self, max_bytes=constants.EVIDENCE_CACHE_DEFAULT):
+        """
+        :param max_bytes: Maximum size of the cached base64 content
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        # (path, size, modification time) -> EvidenceFile
+        self._files = {}
+        # (path, size, modification time) -> content hash, of the cached evidences only
+        self._digests = {}
+        # content hash -> base64 content, least recently used first
+        self._encoded = OrderedDict()
+        # content hash -> identities of the files with this content
+        self._keys = {}
+        # threads prefetching the evidences as they are found, and the cache size planned for them
+        self._prefetch_workers = 0
+        self._prefetch_pool = None
+        self._prefetch_size = 0
+        self._lock = threading.Lock()
+
+    def evidence(self, path):
+        """
+        Get the evidence of a file, the same EvidenceFile is returned while the file is not modified
+
+        :param path: Path to the evidence file
+        :return: EvidenceFile
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime)
+        with self._lock:
+            evidence = self._files.get(key)
+            if evidence is None:
+                evidence = self._files[key] = EvidenceFile(path, key, self)
+                self._submit(evidence)
+        return evidence
+
+    def adopt(self, evidence):
+        """
+        Register an evidence found by another process, e.g. a parse worker
+
+        :param evidence: EvidenceFile, without store
+        :return: The EvidenceFile of the store for the same file
+        """
+        with self._lock:
+            adopted = self._files.get(evidence.key)
+            if adopted is None:
+                evidence.store = self
+                adopted = self._files[evidence.key] = evidence
+                self._submit(adopted)
+        return adopted
+
+    def fits(self, encoded_size):
+        """
+        :param encoded_size: Size of a base64 encoded evidence
+        :return: True if the evidence can be kept in the cache
+        """
+        return encoded_size <= self.max_bytes
+
+    def encoded(self, key):
+        """
+        Get a cached evidence
+
+        :param key: Identity of the evidence file
+        :return: Base64 content of the evidence, None if it is not cached
+        """
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is None:
+                return None
+            encoded = self._encoded.pop(digest)
+            self._encoded[digest] = encoded
+            return encoded
+
+    def read(self, evidence):
+        """
+        Get the base64 content of an evidence, the file is read only if it is not cached
+
+        :param evidence: EvidenceFile of the store
+        :return: Base64 content of the evidence
+        """
+        encoded = self.encoded(evidence.key)
+        if encoded is None:
+            encoded = self.add(evidence.key, _read_file(evidence.path))
+        return encoded
+
+    def add(self, key, data):
+        """
+        Encode an evidence and keep it in the cache, evicting the least recently used evidences, and the files
+        identified with them, if needed. Files with the same content share the cached content.
+
+        :param key: Identity of the evidence file
+        :param data: Content of the evidence file
+        :return: Base64 content of the evidence
+        """
+        with rfw2xray_profile.timer('evidence_hash'):
+            digest = sha1(data).hexdigest()
+        with self._lock:
+            encoded = self._encoded.get(digest)
+        if encoded is None:
+            with rfw2xray_profile.timer('evidence_encode'):
+                encoded = base64.b64encode(data)
+            if not self.fits(len(encoded)):
+                return encoded
+
+        with self._lock:
+            if self._encoded.pop(digest, None) is None:
+                self.size += len(encoded)
+            self._encoded[digest] = encoded
+            self._digests[key] = digest
+            self._keys.setdefault(digest, set()).add(key)
+            while self.size > self.max_bytes:
+                evicted_digest, evicted = self._encoded.popitem(last=False)
+                self.size -= len(evicted)
+                for evicted_key in self._keys.pop(evicted_digest):
+                    del self._digests[evicted_key]
+        return encoded
+
+    def start_prefetch(self, workers=constants.EVIDENCE_WORKERS_DEFAULT):
+        """
+        Read and encode the evidences with a pool of threads as soon as they are found, while they fit in the cache.
+        The pool is started by the first evidence found. The evidences left out, or that could not be read, are read
+        when the test execution is sent.
+
+        :param workers: Number of threads reading evidences, 0 to stop prefetching the evidences found
+        """
+        with self._lock:
+            self._prefetch_workers = workers
+            self._prefetch_size = self.size
+
+    def _submit(self, evidence):
+        """
+        Prefetch an evidence just found, called with the lock held
+        """
+        if not self._prefetch_workers:
+            return
+        encoded_size = evidence.encoded_size()
+        if self._prefetch_size + encoded_size > self.max_bytes:
+            return
+        self._prefetch_size += encoded_size
+        if self._prefetch_pool is None:
+            self._prefetch_pool = ThreadPool(self._prefetch_workers)
+        self._prefetch_pool.apply_async(_read_evidence, (evidence,))
+
+    def wait_prefetch(self):
+        """
+        Wait for the evidences found so far to be prefetched. The pool is stopped, and started again by the next
+        evidence found, e.g. so that no thread runs while a parse worker process is forked.
+        """
+        with self._lock:
+            pool = self._prefetch_pool
+            self._prefetch_pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def prefetch(self, workers=constants.EVIDENCE_WORKERS_DEFAULT, evidences=None):
+        """
+        Read and encode the evidences of the run with a pool of threads, while they fit in the cache.
+        The evidences left out are read when the test execution is sent.
+
+        :param workers: Number of threads reading evidences
+        :param evidences: EvidenceFiles of the store to read, all the evidences of the run by default
+        """
+        with self._lock:
+            pending = []
+            planned_size = self.size
+            files = self._files.values() if evidences is None else set(evidences)
+            for evidence in files:
+                if evidence.key in self._digests:
+                    continue
+                encoded_size = evidence.encoded_size()
+                if planned_size + encoded_size <= self.max_bytes:
+                    planned_size += encoded_size
+                    pending.append(evidence)
+
+        if not pending:
+            return
+
+        pool = ThreadPool(min(workers, len(pending)))
+        try:
+            pool.map(_read_evidence, pending)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def _read_file(path):
+    with rfw2xray_profile.timer('evidence_read'):
+        with open(path, 'rb') as evidence_file:
+            data = evidence_file.read()
+    rfw2xray_profile.count('evidence_files_read')
+    rfw2xray_profile.count('evidence_bytes_read', len(data))
+    return data
+
+
+def _read_evidence(evidence):
+    evidence.store.read(evidence)
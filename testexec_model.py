@@ -0,0 +1,159 @@
+"""
+    Records of a test execution: test execution, test cases, test steps and evidences.
+
+    Records only keep their values, in slots. The translator names of their fields are declared once per class,
+    in 'translation', and testexec_builder applies the translator when a record is serialized. Records are pickled
+    as the tuple of their values, to be sent from the parse workers.
+"""
+import constants as c
+
+
+class Record(object):
+    """
+    Record kept in slots, pickled as the tuple of its slot values
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple([getattr(self, attribute) for attribute in self.__slots__])
+
+    def __setstate__(self, state):
+        for attribute, value in zip(self.__slots__, state):
+            setattr(self, attribute, value)
+
+
+class TestEvidence(Record):
+    """
+    Evidence of a test case or test step
+    """
+    __slots__ = ('data', 'filename', 'contentType')
+    translation = (('data', c.EVIDENCE_DATA), ('filename', c.EVIDENCE_FILENAME),
+                   ('contentType', c.EVIDENCE_CONTENTTYPE))
+
+    def __init__(self, data, filename, contentType=None):
+        """
+        :param data: Evidence content, an EvidenceFile read when the record is serialized
+        :param filename: Evidence file name
+        :param contentType: Evidence content type
+        """
+        self.data = data
+        self.filename = filename
+        self.contentType = contentType
+
+
+class TestStep(Record):
+    """
+    Test step of a test case. Its comment is accumulated in a buffer, joined once when the step is finalized.
+    """
+    __slots__ = ('status', 'evidences', '_comment', '_comment_parts', '_comment_size')
+    translation = (('status', c.STEP_STATUS), ('comment', c.STEP_COMMENT), ('evidences', c.STEP_EVIDENCES))
+
+    # maximum size of a step comment, None for no limit
+    max_comment_bytes = None
+
+    def __init__(self, status):
+        self.status = status
+        self.evidences = []
+        self._comment = ''
+        self._comment_parts = None
+        self._comment_size = 0
+
+    @property
+    def comment(self):
+        if self._comment_parts is not None:
+            self.finalize()
+        return self._comment
+
+    def add_to_comment(self, text):
+        max_bytes = self.max_comment_bytes
+        truncated = max_bytes is not None and self._comment_size + len(text) > max_bytes
+        if truncated:
+            if self._comment_size > max_bytes:
+                # already truncated
+                return
+            text = text[:max_bytes - self._comment_size] + c.COMMENT_TRUNCATED
+
+        if self._comment_parts is None:
+            self._comment_parts = [self._comment] if self._comment else []
+        self._comment_parts.append(text)
+        # a truncated comment is marked by a size over the maximum
+        self._comment_size = max_bytes + 1 if truncated else self._comment_size + len(text)
+
+    def add_evidence(self, evidence):
+        self.evidences.append(evidence)
+
+    def finalize(self):
+        """
+        Join the comment buffer
+        """
+        if self._comment_parts is not None:
+            self._comment = ''.join(self._comment_parts)
+            self._comment_parts = None
+
+
+class TestCase(Record):
+    """
+    Result of a test case
+    """
+    __slots__ = ('testKey', 'status', 'start', 'finish', 'comment', 'executedBy', 'steps', 'evidences')
+    translation = (('testKey', c.TEST_TESTKEY), ('status', c.TEST_STATUS), ('start', c.TEST_START),
+                   ('finish', c.TEST_FINISH), ('comment', c.TEST_COMMENT), ('executedBy', c.TEST_EXECUTEDBY),
+                   ('steps', c.STEPS), ('evidences', c.TEST_EVIDENCES))
+
+    def __init__(self, testKey, status):
+        self.testKey = testKey
+        self.status = status
+        self.start = None
+        self.finish = None
+        self.comment = None
+        self.executedBy = None
+        self.steps = []
+        # only set when the evidences of the steps are added to the test case
+        self.evidences = None
+
+    def add_step(self, step):
+        self.steps.append(step)
+
+    def add_evidences(self, evidences):
+        if self.evidences is None:
+            self.evidences = []
+        self.evidences.extend(evidences)
+
+
+class TestExecInfo(Record):
+    """
+    Fields of the test execution issue
+    """
+    __slots__ = ('project', 'summary', 'description', 'user', 'version', 'revision', 'startDate', 'finishDate',
+                 'testPlanKey', 'testEnvironments')
+    translation = (('project', c.PROJECT), ('summary', c.SUMMARY), ('description', c.DESCRIPTION),
+                   ('user', c.USER), ('version', c.VERSION), ('revision', c.REVISION),
+                   ('startDate', c.STARTDATE), ('finishDate', c.FINISHDATE), ('testPlanKey', c.TESTPLANKEY),
+                   ('testEnvironments', c.TEST_EXECUTION_INFO_TESTENVIRONMENTS_KEY))
+
+    def __init__(self, **kwargs):
+        """
+        :param kwargs: Test execution info values, by translator name
+        """
+        for attribute in self.__slots__:
+            setattr(self, attribute, None)
+        for attribute, value in kwargs.items():
+            setattr(self, attribute, value)
+
+
+class TestExec(Record):
+    """
+    Test execution to import, its info is merged in the same JSON object
+    """
+    __slots__ = ('testExecutionKey', 'info', 'tests')
+    translation = (('testExecutionKey', c.TESTEXECUTIONKEY), ('info', None), ('tests', c.TESTS))
+
+    def __init__(self, tests, testExecutionKey=None, info=None):
+        """
+        :param tests: List of TestCase
+        :param testExecutionKey: Key of the test execution to update, None to create it
+        :param info: TestExecInfo
+        """
+        self.testExecutionKey = testExecutionKey
+        self.info = info
+        self.tests = tests